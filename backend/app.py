@@ -1,12 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
+import os
+import threading
 import traceback
 from datetime import datetime
 
-from services.stock_data import get_stock_data
-from models.recommendation import get_recommendations
 from services.demo_data import get_demo_portfolio
-from services.prediction import predict_stock
+from services.scheduler import JOBS_ENABLED
+from services import prediction_jobs
+from utils.cache import cache_stats
+from utils.lazy import lazy_import, ensure_loaded
+from utils.resilience import set_deadline, reset_deadline, breaker_stats
 from services.beginner_service import (
     assess_risk_profile, 
     get_beginner_recommendations, 
@@ -15,9 +19,81 @@ from services.beginner_service import (
     get_investment_calculator,
     get_beginner_glossary
 )
+
+# Services that pull in pandas/NumPy are imported on first use, so workers
+# start fast and endpoints like /api/health never pay for them
+stock_data = lazy_import("services.stock_data")
+recommendation = lazy_import("models.recommendation")
+prediction = lazy_import("services.prediction")
+model_registry = lazy_import("services.model_registry")
+fundamentals = lazy_import("services.fundamentals")
+
+# INVESTEZY_PRELOAD=1 imports everything at load time instead, e.g. with
+# `gunicorn --preload` so the master pays once and forked workers share it
+PRELOAD = os.environ.get("INVESTEZY_PRELOAD", "0") == "1"
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all domains on all routes
 
+def preload():
+    """Import the heavy services and load the LSTM weights now (safe before fork)"""
+    for module in (stock_data, recommendation, prediction, model_registry, fundamentals):
+        ensure_loaded(module)
+    model_registry.get_model()
+
+if PRELOAD:
+    preload()
+
+_background_started = False
+_background_lock = threading.Lock()
+
+def _warm_up():
+    # Load stored fundamentals and keep them fresh off the request path
+    fundamentals.start_background_refresh()
+
+    # Load the LSTM weights before the first prediction request needs them
+    model_registry.get_model()
+
+    # Recompute materialized metrics after market close (only if INVESTEZY_RUN_JOBS=1)
+    if JOBS_ENABLED:
+        from services import metrics_table, price_panel, correlation, similarity_index, prediction_cache
+        metrics_table.schedule_refresh()
+        price_panel.schedule_refresh()
+        prediction_cache.schedule_refresh()
+        correlation.schedule_refresh(recommendation.RECOMMENDATION_UNIVERSE)
+        similarity_index.schedule_refresh()
+
+def start_background_work():
+    """
+    Start this process's background work, once, on its first request
+
+    Not done at import: threads don't survive a fork, so starting them in a
+    preloading master would lose them. The imports and loading happen on a
+    daemon thread so the first request doesn't wait for them.
+    """
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+        _background_started = True
+
+# Time budget (seconds) shared by every upstream fetch made while serving a request
+REQUEST_BUDGET = float(os.environ.get("INVESTEZY_REQUEST_BUDGET", 8))
+
+@app.before_request
+def start_request_budget():
+    start_background_work()
+    g.deadline_token = set_deadline(REQUEST_BUDGET)
+
+@app.teardown_request
+def end_request_budget(exc):
+    token = g.pop("deadline_token", None)
+    if token is not None:
+        reset_deadline(token)
+
 @app.route('/api/portfolio/<email>', methods=['GET'])
 def get_portfolio(email):
     """Get demo portfolio for a user by email"""
@@ -39,7 +115,7 @@ def recommend(email):
             return jsonify({"error": "No stocks found in portfolio 😕", "success": False}), 404
             
         # Get recommendations
-        recommendations = get_recommendations(all_stocks)
+        recommendations = recommendation.get_recommendations(all_stocks)
         return jsonify(recommendations)
         
     except Exception as e:
@@ -47,11 +123,49 @@ def recommend(email):
         traceback.print_exc()
         return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
 
+@app.route('/api/recommend/batch', methods=['POST'])
+def recommend_batch():
+    """Get recommendations for many users or portfolios in one pass"""
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Expected a JSON object with emails or portfolios 😕", "success": False}), 400
+        emails = data.get("emails", [])
+        portfolios = data.get("portfolios", {})
+        if not isinstance(emails, list) or not all(isinstance(e, str) for e in emails):
+            return jsonify({"error": "emails must be a list of strings 😕", "success": False}), 400
+        if not isinstance(portfolios, dict) or not all(
+            isinstance(stocks, list) and all(isinstance(s, str) for s in stocks)
+            for stocks in portfolios.values()
+        ):
+            return jsonify({"error": "portfolios must map each key to a list of ticker strings 😕", "success": False}), 400
+        portfolios = dict(portfolios)
+
+        # Flatten each demo portfolio across platforms
+        for email in emails:
+            portfolio = get_demo_portfolio(email)
+            portfolios[email] = [s for stocks in portfolio.values() for s in stocks]
+
+        if not portfolios:
+            return jsonify({"error": "No emails or portfolios provided 😕", "success": False}), 400
+
+        results = recommendation.get_recommendations_batch(portfolios)
+        return jsonify({
+            "results": results,
+            "count": len(results),
+            "success": True
+        })
+
+    except Exception as e:
+        print(f"Error in batch recommend endpoint: {str(e)}")
+        traceback.print_exc()
+        return jsonify({"error": f"Server error: {str(e)}", "success": False}), 500
+
 @app.route('/api/stock/<ticker>', methods=['GET'])
 def stock_info(ticker):
     """Get detailed information for a single stock"""
     years = request.args.get('years', default=5, type=int)
-    data = get_stock_data(ticker, years, with_metrics=True)
+    data = stock_data.get_stock_data(ticker, years, with_metrics=True)
     
     if data and "error" not in data:
         # Add friendly message
@@ -70,11 +184,9 @@ def compare_stocks():
     ticker_list = [t.strip() for t in tickers.split(',')]
     years = request.args.get('years', default=5, type=int)
     
-    results = []
-    for ticker in ticker_list:
-        data = get_stock_data(ticker, years, with_metrics=True)
-        if data and "error" not in data:
-            results.append(data)
+    # One batched fetch for the whole list instead of a request per ticker
+    metrics, errors = stock_data.get_stock_data_many(ticker_list, years, with_metrics=True)
+    results = list(metrics.values())
     
     # Add comparison insights
     comparison = {}
@@ -88,20 +200,84 @@ def compare_stocks():
         "success": True
     })
 
+# Seconds the /api/predict endpoints wait for their job before answering 202 with a job id
+PREDICT_WAIT = float(os.environ.get("INVESTEZY_PREDICT_WAIT", 10))
+PREDICT_MAX_WAIT = 30
+
+def _job_response(job):
+    """The forecast if the job finished, else 202 with where to poll"""
+    status = job.status
+    if status == "done":
+        return jsonify(job.result)
+    if status == "failed":
+        return jsonify(job.to_dict() | {"success": False}), 500
+    return jsonify(job.to_dict() | {
+        "statusUrl": f"/api/predict/jobs/{job.id}",
+        "success": True
+    }), 202
+
+def _queue_full():
+    return jsonify({
+        "error": "Too many predictions in progress, please try again shortly ⏳",
+        "success": False
+    }), 429
+
+def _days_out_of_range():
+    return jsonify({
+        "error": f"days must be between 1 and {prediction_jobs.MAX_DAYS} 📅",
+        "success": False
+    }), 400
+
+@app.route('/api/predict', methods=['GET'])
+def predict_prices():
+    """Predict future prices for several stocks in one batched pass (on the prediction worker pool)"""
+    tickers = request.args.get('tickers', '')
+    if not tickers:
+        return jsonify({"error": "No tickers provided 😕", "success": False}), 400
+    
+    ticker_list = [t.strip() for t in tickers.split(',')]
+    days = request.args.get('days', default=30, type=int)
+    if not 1 <= days <= prediction_jobs.MAX_DAYS:
+        return _days_out_of_range()
+    wait = request.args.get('wait', default=PREDICT_WAIT, type=float)
+    try:
+        job = prediction_jobs.submit_batch(ticker_list, days)
+    except ValueError as e:
+        return jsonify({"error": f"{str(e)} 😕", "success": False}), 400
+    except prediction_jobs.QueueFull:
+        return _queue_full()
+    
+    if wait > 0:
+        job.wait(min(wait, PREDICT_MAX_WAIT))
+    return _job_response(job)
+
 @app.route('/api/predict/<ticker>', methods=['GET'])
 def predict_price(ticker):
-    """Predict future prices for a stock"""
+    """Predict future prices for a stock (runs on the prediction worker pool)"""
     days = request.args.get('days', default=30, type=int)
+    if not 1 <= days <= prediction_jobs.MAX_DAYS:
+        return _days_out_of_range()
+    wait = request.args.get('wait', default=PREDICT_WAIT, type=float)
     try:
-        prediction = predict_stock(ticker, days)
-        return jsonify(prediction)
-    except Exception as e:
-        print(f"Error in prediction: {str(e)}")
-        traceback.print_exc()
-        return jsonify({
-            "error": f"Prediction failed: {str(e)}",
-            "success": False
-        }), 500
+        job = prediction_jobs.submit(ticker, days)
+    except prediction_jobs.QueueFull:
+        return _queue_full()
+    
+    if wait > 0:
+        job.wait(min(wait, PREDICT_MAX_WAIT))
+    return _job_response(job)
+
+@app.route('/api/predict/jobs/<job_id>', methods=['GET'])
+def prediction_job(job_id):
+    """Status or result of a queued prediction"""
+    job = prediction_jobs.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired prediction job 😕", "success": False}), 404
+    
+    wait = request.args.get('wait', default=0, type=float)
+    if wait > 0:
+        job.wait(min(wait, PREDICT_MAX_WAIT))
+    return _job_response(job)
 
 # NEW ENDPOINTS FOR BEGINNERS
 # Add these routes to your app.py file
@@ -208,7 +384,11 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "cache": cache_stats(),
+        "upstream": breaker_stats(),
+        "model": model_registry.model_stats(),
+        "predictionQueue": prediction_jobs.queue_stats()
     })
 
 def generate_friendly_message(stock_data):
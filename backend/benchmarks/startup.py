@@ -0,0 +1,68 @@
+"""
+Cold-start benchmark for the API module
+
+Imports app.py in fresh interpreters, reports the best wall time, and fails
+if it exceeds the budget or if any heavy dependency got imported eagerly.
+
+Run from backend/ with:
+    python -m benchmarks.startup [--runs 5] [--budget 1.5]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# Seconds allowed for `import app` (without INVESTEZY_PRELOAD)
+IMPORT_BUDGET = float(os.environ.get("INVESTEZY_IMPORT_BUDGET", 1.5))
+
+# Must not be imported until a request needs them
+HEAVY_MODULES = ["tensorflow", "keras", "sklearn", "yfinance", "pandas", "numpy"]
+
+_PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(runs):
+    """Time `import app` in `runs` fresh interpreters"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, INVESTEZY_PRELOAD="0", INVESTEZY_RUN_JOBS="0")
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE], cwd=backend_dir, env=env,
+            capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET)
+    args = parser.parse_args(argv)
+
+    results = measure(args.runs)
+    best = min(r["seconds"] for r in results)
+    loaded = sorted({m for r in results for m in r["loaded"]})
+    print(f"import app: best {best * 1000:.0f} ms over {args.runs} runs "
+          f"(budget {args.budget * 1000:.0f} ms)")
+
+    failures = []
+    if best > args.budget:
+        failures.append(f"import took {best:.2f}s, over the {args.budget:.2f}s budget")
+    if loaded:
+        failures.append(f"heavy modules imported at startup: {', '.join(loaded)}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
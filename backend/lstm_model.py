@@ -1,51 +1,88 @@
 import numpy as np
 import pandas as pd
-import yfinance as yf
 import tensorflow as tf
 from tensorflow import keras
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.model_selection import train_test_split
+from numpy.lib.stride_tricks import sliding_window_view
 import os
+import sys
+import json
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
+from services.market_data import get_provider, period_start
+from services import price_store
+from services.catalog import get_catalog
+from utils.lstm_numpy import export_weights
 
 
 # Configuration
 MODEL_SAVE_PATH = "model/stock_lstm_model.keras"
+WEIGHTS_SAVE_PATH = "model/stock_lstm_weights.npz"  # Read by the API's NumPy inference
 SEQUENCE_LENGTH = 60  # Number of days to look back for prediction
 FUTURE_DAYS = 1       # Number of days to predict ahead
 EPOCHS = 50
 BATCH_SIZE = 32
 VALIDATION_SPLIT = 0.2
+SHUFFLE_BUFFER = 100_000  # Window offsets shuffled at a time
+PREFETCH_BATCHES = tf.data.AUTOTUNE
+DOWNLOAD_WORKERS = 4  # Concurrent batched downloads of training data
+
+# Incremental fine-tuning (see fine_tune_lstm_model)
+CHECKPOINT_PATH = "model/training_state.json"  # Newest bar the saved model was trained on
+FINE_TUNE_EPOCHS = 5
+FINE_TUNE_LEARNING_RATE = 1e-4
+FINE_TUNE_REPLAY = 1024  # Older windows added to the holdout to catch forgetting
+HOLDOUT_DAYS = 5  # Latest target dates held out (across all tickers) to gate the swap
+MIN_HOLDOUT_WINDOWS = 50  # Fewer than this and the fine-tuned model isn't swapped in
 
 # Create model directory if it doesn't exist
 os.makedirs(os.path.dirname(MODEL_SAVE_PATH), exist_ok=True)
 
-def download_indian_stock_data(tickers, period="2y"):
+def download_indian_stock_data(tickers, period="2y", offline=False):
     """
     Download historical data for a list of Indian stocks
+
+    Histories are kept in the local price store, so only bars newer than the
+    last stored date are downloaded (nothing for tickers synced within the
+    store's refresh interval). Tickers are synced in batched downloads on up
+    to DOWNLOAD_WORKERS threads. With offline=True only stored bars are used.
     """
+    # Any yfinance-style period ("2y", "6mo", "30d", "max"); ValueError for others
+    start = period_start(period, pd.Timestamp.today().normalize())
+    start_day = None if start is None else int(np.datetime64(start, "D").astype(np.int64))
+    
+    # Add .NS suffix for NSE listed stocks if not already present
+    symbols = list(dict.fromkeys(t if '.NS' in t else f"{t}.NS" for t in tickers))
+    
+    if offline:
+        bars = {t: price_store.load_bars(t) for t in symbols}
+        errors = {t: "Not in the local price store" for t, rows in bars.items() if rows is None}
+    else:
+        print(f"Syncing data for {len(symbols)} stocks...")
+        chunk_size = min(price_store.BATCH_SIZE, max(1, -(-len(symbols) // DOWNLOAD_WORKERS)))
+        chunks = [symbols[i:i + chunk_size] for i in range(0, len(symbols), chunk_size)]
+        bars, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            for chunk_bars, chunk_errors in pool.map(price_store.sync_many, chunks):
+                bars.update(chunk_bars)
+                errors.update(chunk_errors)
+    
     all_data = {}
-    for ticker in tickers:
-        # Add .NS suffix for NSE listed stocks if not already present
-        if '.NS' not in ticker:
-            ticker_symbol = f"{ticker}.NS"
-        else:
-            ticker_symbol = ticker
-            
-        print(f"Downloading data for {ticker_symbol}...")
+    for ticker_symbol in symbols:
+        rows = bars.get(ticker_symbol)
+        if rows is None:
+            print(f"Error downloading {ticker_symbol}: {errors.get(ticker_symbol, 'no data')}")
+            continue
         
-        try:
-            stock = yf.Ticker(ticker_symbol)
-            hist = stock.history(period=period)
-            
-            if not hist.empty and len(hist) > 100:
-                all_data[ticker_symbol] = hist
-                print(f"Successfully downloaded {len(hist)} days of data for {ticker_symbol}")
-            else:
-                print(f"Insufficient data for {ticker_symbol}")
-        except Exception as e:
-            print(f"Error downloading {ticker_symbol}: {str(e)}")
+        if start_day is not None:
+            rows = rows[np.searchsorted(rows[:, 0], start_day, side="right"):]
+        hist = price_store.rows_to_frame(rows)
+        if not hist.empty and len(hist) > 100:
+            all_data[ticker_symbol] = hist
+            print(f"Loaded {len(hist)} days of data for {ticker_symbol}")
+        else:
+            print(f"Insufficient data for {ticker_symbol}")
     
     return all_data
 
@@ -54,14 +91,88 @@ def create_sequences(data, seq_length=SEQUENCE_LENGTH, future_days=FUTURE_DAYS):
     Create sequences of data for LSTM training
     X: sequence of seq_length days
     y: price after future_days
+
+    For (days, features) data X is (samples, seq_length, features) and y is
+    (samples, features), as before; X is a strided view of `data`, so no
+    window is copied.
+    """
+    data = np.asarray(data)
+    samples = max(len(data) - seq_length - future_days, 0)
+    if samples == 0:
+        return np.empty((0, seq_length, *data.shape[1:]), dtype=data.dtype), data[:0]
+    X = sliding_window_view(data, seq_length, axis=0)[:samples]
+    if data.ndim > 1:
+        # Window axis comes last from sliding_window_view; move it after samples
+        X = np.moveaxis(X, -1, 1)
+    y = data[seq_length + future_days - 1:seq_length + future_days - 1 + samples]
+    return X, y
+
+def prepare_training_data(stock_data, seq_length=SEQUENCE_LENGTH, future_days=FUTURE_DAYS):
+    """
+    Scale each stock's closes to [0, 1] and index its training windows
+
+    Returns:
+        (values, starts, target_days) where values holds every scaled series
+        back to back (float32), starts holds the offset of each training
+        window in it, so memory stays proportional to the raw price data,
+        and target_days holds the date (days since 1970-01-01) each window
+        predicts
+    """
+    series, starts, target_days = [], [], []
+    offset = 0
+    for ticker, data in stock_data.items():
+        print(f"Processing {ticker} for training...")
+        
+        # Use closing prices
+        close_prices = data['Close'].values.reshape(-1, 1)
+        
+        # Normalize data
+        scaler = MinMaxScaler(feature_range=(0, 1))
+        scaled_data = scaler.fit_transform(close_prices).astype(np.float32).reshape(-1)
+        
+        # Windows never cross from one stock into the next
+        samples = len(scaled_data) - seq_length - future_days
+        if samples > 0:
+            days = pd.DatetimeIndex(data.index).values.astype("datetime64[D]").astype(np.int64)
+            series.append(scaled_data)
+            starts.append(offset + np.arange(samples, dtype=np.int64))
+            target_days.append(days[seq_length + future_days - 1:seq_length + future_days - 1 + samples])
+            offset += len(scaled_data)
+    
+    if not starts:
+        raise ValueError("No valid training data was created. Check the stock data.")
+    
+    return np.concatenate(series), np.concatenate(starts), np.concatenate(target_days)
+
+def make_dataset(values, starts, seq_length=SEQUENCE_LENGTH, future_days=FUTURE_DAYS, shuffle=False):
+    """
+    Stream (window, target) batches gathered from `values` at `starts`
+
+    Only window offsets are shuffled and batched; windows are gathered per
+    batch (and prefetched while the model trains), so only a few batches
+    of windows exist at any time.
     """
-    X, y = [], []
+    values = tf.constant(values)
+    window = tf.range(seq_length, dtype=tf.int64)
     
-    for i in range(len(data) - seq_length - future_days):
-        X.append(data[i:(i + seq_length)])
-        y.append(data[i + seq_length + future_days - 1])
+    def gather(batch_starts):
+        X = tf.gather(values, batch_starts[:, None] + window)[..., None]
+        y = tf.gather(values, batch_starts + seq_length + future_days - 1)[:, None]
+        return X, y
     
-    return np.array(X), np.array(y)
+    dataset = tf.data.Dataset.from_tensor_slices(starts)
+    if shuffle:
+        dataset = dataset.shuffle(min(len(starts), SHUFFLE_BUFFER), seed=42, reshuffle_each_iteration=True)
+    return (dataset
+            .batch(BATCH_SIZE)
+            .map(gather, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(PREFETCH_BATCHES))
+
+def split_starts(starts, fraction, seed=42):
+    """Randomly split window offsets into (rest, held out `fraction`)"""
+    shuffled = np.random.default_rng(seed).permutation(starts)
+    held_out = int(len(shuffled) * fraction)
+    return shuffled[held_out:], shuffled[:held_out]
 
 def build_lstm_model(sequence_length):
     """
@@ -79,54 +190,32 @@ def build_lstm_model(sequence_length):
     model.compile(optimizer='adam', loss='mean_squared_error')
     return model
 
-def train_lstm_model():
+def train_lstm_model(offline=False):
     """
     Train LSTM model on Indian stock data
+
+    With offline=True training uses only histories already in the local
+    price store.
     """
     # List of major Indian stocks for diverse training (Nifty 50 stocks)
-    indian_stocks = [
-        'RELIANCE', 'TCS', 'HDFCBANK', 'INFY', 'ICICIBANK', 
-        'HINDUNILVR', 'BHARTIARTL', 'KOTAKBANK', 'ITC', 'LT',
-        'AXISBANK', 'SBIN', 'BAJFINANCE', 'ASIANPAINT', 'MARUTI',
-        'TITAN', 'SUNPHARMA', 'NESTLEIND', 'BAJAJFINSV', 'WIPRO'
-    ]
+    indian_stocks = get_catalog().large_caps
     
     # Download data
-    stock_data = download_indian_stock_data(indian_stocks)
+    stock_data = download_indian_stock_data(indian_stocks, offline=offline)
     
-    # Prepare data for model
-    all_X = []
-    all_y = []
+    # Scaled series plus the offset of every training window in them
+    values, starts, target_days = prepare_training_data(stock_data)
     
-    # Process each stock
-    for ticker, data in stock_data.items():
-        print(f"Processing {ticker} for training...")
-        
-        # Use closing prices
-        close_prices = data['Close'].values.reshape(-1, 1)
-        
-        # Normalize data
-        scaler = MinMaxScaler(feature_range=(0, 1))
-        scaled_data = scaler.fit_transform(close_prices)
-        
-        # Create sequences
-        X, y = create_sequences(scaled_data)
-        
-        if len(X) > 0:
-            all_X.append(X)
-            all_y.append(y)
+    print(f"Total training samples: {len(starts)}")
     
-    # Combine data from all stocks
-    if not all_X or not all_y:
-        raise ValueError("No valid training data was created. Check the stock data.")
-    
-    X = np.vstack(all_X)
-    y = np.vstack(all_y)
-    
-    print(f"Total training samples: {len(X)}")
-    
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Split data into training, validation and testing sets
+    train_starts, test_starts = split_starts(starts, 0.2)
+    train_starts, val_starts = split_starts(train_starts, VALIDATION_SPLIT, seed=43)
+    if len(train_starts) == 0 or len(val_starts) == 0 or len(test_starts) == 0:
+        raise ValueError(f"Only {len(starts)} training windows, too few to split into training, validation and test sets.")
+    train_ds = make_dataset(values, train_starts, shuffle=True)
+    val_ds = make_dataset(values, val_starts)
+    test_ds = make_dataset(values, test_starts)
     
     # Build model
     model = build_lstm_model(SEQUENCE_LENGTH)
@@ -141,21 +230,22 @@ def train_lstm_model():
     # Train model
     print("Training model...")
     history = model.fit(
-        X_train, y_train,
+        train_ds,
         epochs=EPOCHS,
-        batch_size=BATCH_SIZE,
-        validation_split=VALIDATION_SPLIT,
+        validation_data=val_ds,
         callbacks=[early_stopping],
         verbose=1
     )
     
     # Evaluate model
-    test_loss = model.evaluate(X_test, y_test, verbose=0)
+    test_loss = model.evaluate(test_ds, verbose=0)
     print(f"Test loss: {test_loss}")
     
-    # Save model
+    # Export (and verify) the served weights first, so a failed export changes nothing
+    export_model_weights(model)
     model.save(MODEL_SAVE_PATH)
     print(f"Model saved to {MODEL_SAVE_PATH}")
+    save_checkpoint(target_days.max(), "full", test_loss)
     
     # Plot training history
     plt.figure(figsize=(12, 6))
@@ -169,6 +259,104 @@ def train_lstm_model():
     
     return model
 
+def load_checkpoint():
+    """What the saved model was last trained on, or None"""
+    try:
+        with open(CHECKPOINT_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(last_bar, mode, loss):
+    """Record the newest bar the saved model has been trained on"""
+    checkpoint = {
+        "lastBar": int(last_bar),
+        "lastDate": str(np.datetime64(int(last_bar), "D")),
+        "mode": mode,
+        "loss": float(loss),
+        "trainedAt": datetime.now().isoformat()
+    }
+    tmp_path = f"{CHECKPOINT_PATH}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, CHECKPOINT_PATH)
+
+def fine_tune_lstm_model(offline=False, epochs=FINE_TUNE_EPOCHS):
+    """
+    Warm-start the saved model on bars added since its last checkpoint
+
+    Windows whose target falls on the latest HOLDOUT_DAYS dates (across all
+    tickers) are held out, together with a sample of older windows so
+    forgetting shows up too. The remaining windows whose target is newer
+    than the checkpoint are trained on. The fine-tuned model replaces the
+    saved one, together with its verified exported weights, only if its
+    holdout loss is no worse. Falls back to full training when there is no
+    saved model or checkpoint.
+
+    Returns:
+        The model now saved, or None if there was nothing new to train on
+    """
+    checkpoint = load_checkpoint()
+    if checkpoint is None or not os.path.exists(MODEL_SAVE_PATH):
+        print("No saved model checkpoint, training from scratch...")
+        return train_lstm_model(offline=offline)
+    
+    stock_data = download_indian_stock_data(get_catalog().large_caps, offline=offline)
+    values, starts, target_days = prepare_training_data(stock_data)
+    
+    # Fixed trailing-date holdout, never trained on
+    holdout_from = np.unique(target_days)[-HOLDOUT_DAYS:][0]
+    in_holdout = target_days >= holdout_from
+    is_new = (target_days > checkpoint["lastBar"]) & ~in_holdout
+    train_starts, old_starts = starts[is_new], starts[~is_new & ~in_holdout]
+    if len(train_starts) == 0:
+        print(f"No bars newer than {checkpoint['lastDate']} outside the holdout, nothing to fine-tune")
+        return None
+    if in_holdout.sum() < MIN_HOLDOUT_WINDOWS:
+        print(f"Only {in_holdout.sum()} holdout windows, too few to validate a fine-tuned model")
+        return None
+    
+    _, replay_starts = split_starts(old_starts, min(1.0, FINE_TUNE_REPLAY / max(len(old_starts), 1)))
+    holdout_ds = make_dataset(values, np.concatenate([starts[in_holdout], replay_starts]))
+    print(f"Fine-tuning on {len(train_starts)} new windows since {checkpoint['lastDate']}...")
+    
+    current = keras.models.load_model(MODEL_SAVE_PATH)
+    baseline_loss = current.evaluate(holdout_ds, verbose=0)
+    
+    model = keras.models.load_model(MODEL_SAVE_PATH)
+    model.compile(optimizer=keras.optimizers.Adam(learning_rate=FINE_TUNE_LEARNING_RATE), loss='mean_squared_error')
+    model.fit(make_dataset(values, train_starts, shuffle=True), epochs=epochs, verbose=1)
+    loss = model.evaluate(holdout_ds, verbose=0)
+    print(f"Holdout loss: {baseline_loss:.6f} before, {loss:.6f} after fine-tuning")
+    
+    if loss > baseline_loss:
+        print("Fine-tuned model is worse on the holdout, keeping the current model")
+        return current
+    
+    # Write and verify both files next to the live ones before swapping either in
+    staged_weights = WEIGHTS_SAVE_PATH.replace(".npz", ".new.npz")
+    staged_model = MODEL_SAVE_PATH.replace(".keras", ".new.keras")
+    export_model_weights(model, staged_weights)
+    model.save(staged_model)
+    os.replace(staged_model, MODEL_SAVE_PATH)
+    os.replace(staged_weights, WEIGHTS_SAVE_PATH)
+    print(f"Model saved to {MODEL_SAVE_PATH} and weights to {WEIGHTS_SAVE_PATH}")
+    save_checkpoint(target_days[is_new].max(), "fine-tune", loss)
+    return model
+
+def export_model_weights(model=None, path=WEIGHTS_SAVE_PATH):
+    """
+    Export weights for serving without TensorFlow
+
+    Loads the saved Keras model if none is given. The export is checked
+    against Keras predictions before it replaces the file at `path`
+    (ValueError if they differ).
+    """
+    if model is None:
+        model = keras.models.load_model(MODEL_SAVE_PATH)
+    difference = export_weights(model, path)
+    print(f"Weights exported to {path} (max difference from Keras {difference:.2e})")
+
 def test_model_prediction(model, ticker="RELIANCE.NS"):
     """
     Test model prediction on a specific stock
@@ -176,8 +364,7 @@ def test_model_prediction(model, ticker="RELIANCE.NS"):
     print(f"Testing prediction on {ticker}...")
     
     # Get recent data
-    stock = yf.Ticker(ticker)
-    hist = stock.history(period="2y")
+    hist = get_provider().history(ticker, period="2y")
     
     if hist.empty or len(hist) < SEQUENCE_LENGTH:
         print(f"Insufficient data for {ticker}")
@@ -206,6 +393,12 @@ def test_model_prediction(model, ticker="RELIANCE.NS"):
     print(f"Predicted change: {((predicted_price/actual_price)-1)*100:.2f}%")
 
 if __name__ == "__main__":
+    if "--export" in sys.argv[1:]:
+        export_model_weights()
+        sys.exit(0)
+    if "--fine-tune" in sys.argv[1:]:
+        fine_tune_lstm_model(offline="--offline" in sys.argv[1:])
+        sys.exit(0)
     print("Starting Indian Stock LSTM Model Training...")
     
 
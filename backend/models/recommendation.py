@@ -1,13 +1,62 @@
 import pandas as pd
 import numpy as np
-from services.stock_data import get_stock_data
+from services.stock_data import get_stock_data_many
+from services.correlation import get_correlation_matrix
+from services.similarity_index import get_similarity_index
+from services.demo_data import demo_portfolios
+from services.catalog import get_catalog
 import random
 
-def get_recommendations(user_portfolio, max_recommendations=3):
+# Company details, curated lists and explanation texts, loaded once
+CATALOG = get_catalog()
+
+# Popular Indian stocks for fallback
+POPULAR_STOCKS = CATALOG.popular
+
+# Explanation types as ticker sets, so picking one is a few membership tests
+STABLE_STOCKS = CATALOG.with_attribute("stability", "high", "very high")
+DIVIDEND_STOCKS = CATALOG.with_attribute("dividend", "good", "excellent")
+GROWTH_STOCKS = CATALOG.with_attribute("growth", "good", "high")
+DEFENSIVE_STOCKS = CATALOG.with_attribute("risk", "low", "very low")
+
+# Tickers covered by the precomputed correlation matrix
+RECOMMENDATION_UNIVERSE = list(dict.fromkeys(
+    POPULAR_STOCKS + [t for p in demo_portfolios.values() for stocks in p.values() for t in stocks]
+))
+
+def _daily_returns(prices):
+    """
+    Daily returns between each ticker's own consecutive closes
+
+    The precomputed correlation matrix and similarity index rank by these
+    too, so live and precomputed recommendations use the same metric.
+    """
+    return prices.apply(lambda closes: closes.dropna().pct_change())
+
+def _precomputed_similar(portfolio):
+    """
+    The two most correlated stocks outside the portfolio for each holding,
+    from the full-market similarity index if built, else the recommendation
+    universe matrix (None if neither exists)
+    """
+    precomputed = get_similarity_index() or get_correlation_matrix()
+    if precomputed is None:
+        return None
+    return {
+        stock: precomputed.top_k(stock, 2, exclude=portfolio)
+        for stock in portfolio if stock in precomputed
+    }
+
+def get_recommendations(user_portfolio, max_recommendations=3, similar_for=_precomputed_similar):
     """
     Get stock recommendations based on portfolio correlation with beginner-friendly explanations
     
     Returns similar stocks not already in the portfolio with detailed, easy-to-understand explanations
+
+    Args:
+        similar_for: Function of the cleaned portfolio returning precomputed
+            neighbours per holding (see _precomputed_similar); the batch
+            endpoint passes one backed by a shared search
     """
     if not user_portfolio:
         return {"error": "No stocks in portfolio", "success": False}
@@ -16,98 +65,58 @@ def get_recommendations(user_portfolio, max_recommendations=3):
     valid_portfolio = [stock.strip() for stock in user_portfolio if stock and stock.strip()]
     
     # Popular Indian stocks for fallback
-    popular_stocks = [
-        "RELIANCE.NS", "TCS.NS", "INFY.NS", "HDFCBANK.NS", "ICICIBANK.NS", 
-        "SBIN.NS", "BHARTIARTL.NS", "WIPRO.NS", "BAJFINANCE.NS", "ITC.NS",
-        "TATAMOTORS.NS", "MARUTI.NS", "HINDUNILVR.NS", "ASIANPAINT.NS", "AXISBANK.NS"
-    ]
+    popular_stocks = POPULAR_STOCKS
     
-    # Map tickers to company names and industry sectors
-    company_data = {
-        "RELIANCE.NS": {"name": "Reliance Industries", "sector": "Oil & Gas", "stability": "high", "growth": "moderate", "dividend": "good", "risk": "low"},
-        "TCS.NS": {"name": "Tata Consultancy Services", "sector": "IT", "stability": "very high", "growth": "steady", "dividend": "excellent", "risk": "very low"},
-        "INFY.NS": {"name": "Infosys", "sector": "IT", "stability": "high", "growth": "steady", "dividend": "good", "risk": "low"},
-        "HDFCBANK.NS": {"name": "HDFC Bank", "sector": "Banking", "stability": "high", "growth": "good", "dividend": "moderate", "risk": "low"},
-        "ICICIBANK.NS": {"name": "ICICI Bank", "sector": "Banking", "stability": "high", "growth": "good", "dividend": "moderate", "risk": "low-moderate"},
-        "SBIN.NS": {"name": "State Bank of India", "sector": "Banking", "stability": "moderate", "growth": "good", "dividend": "moderate", "risk": "moderate"},
-        "BHARTIARTL.NS": {"name": "Bharti Airtel", "sector": "Telecom", "stability": "moderate", "growth": "good", "dividend": "moderate", "risk": "moderate"},
-        "WIPRO.NS": {"name": "Wipro", "sector": "IT", "stability": "high", "growth": "moderate", "dividend": "good", "risk": "low"},
-        "BAJFINANCE.NS": {"name": "Bajaj Finance", "sector": "Financial Services", "stability": "moderate", "growth": "high", "dividend": "low", "risk": "moderate-high"},
-        "ITC.NS": {"name": "ITC Limited", "sector": "FMCG", "stability": "very high", "growth": "moderate", "dividend": "excellent", "risk": "very low"},
-        "TATAMOTORS.NS": {"name": "Tata Motors", "sector": "Automotive", "stability": "moderate", "growth": "high", "dividend": "low", "risk": "moderate-high"},
-        "MARUTI.NS": {"name": "Maruti Suzuki", "sector": "Automotive", "stability": "high", "growth": "moderate", "dividend": "good", "risk": "low-moderate"},
-        "HINDUNILVR.NS": {"name": "Hindustan Unilever", "sector": "FMCG", "stability": "very high", "growth": "steady", "dividend": "good", "risk": "very low"},
-        "ASIANPAINT.NS": {"name": "Asian Paints", "sector": "Paints", "stability": "high", "growth": "good", "dividend": "moderate", "risk": "low"},
-        "AXISBANK.NS": {"name": "Axis Bank", "sector": "Banking", "stability": "moderate", "growth": "good", "dividend": "moderate", "risk": "moderate"}
-    }
+    # Explanation texts from the shared catalog
+    beginner_explanations = CATALOG.explanations
     
-    # Beginner-friendly explanations for different types of stocks
-    beginner_explanations = {
-        "blue_chip": [
-            "Perfect for beginners: This is a well-established company with a history of reliable performance 🏆",
-            "A 'blue-chip' stock that's considered very stable and suitable for new investors 🔵",
-            "Historically stable with consistent performance - an excellent foundation for any portfolio 🏛️"
-        ],
-        "dividend": [
-            "Pays regular dividends, giving you income while you hold the stock 💰",
-            "Known for returning profits to shareholders through dividends - extra cash in your pocket! 💸",
-            "Regular dividend payments make this an income-generating investment 📈"
-        ],
-        "growth": [
-            "Shows strong growth potential that could increase your investment value over time 🚀",
-            "Growing faster than many similar companies, with potential for higher returns 📈",
-            "Has momentum in a growing sector, offering good potential for investment gains 🌱"
-        ],
-        "defensive": [
-            "A more stable option that typically weathers market downturns better than others ⛈️",
-            "Tends to remain stable even when markets are volatile - good for peace of mind 🛡️",
-            "Less affected by economic cycles, providing stability when markets get rough 🧱"
-        ],
-        "sector_diversification": [
-            "Helps diversify your portfolio by adding exposure to a new industry sector 🧩",
-            "Adds balance to your investments by introducing a different business sector 🔄",
-            "Reduces overall portfolio risk by spreading investments across different industries 🌐"
-        ]
-    }
+    # Identify portfolio sectors to suggest diversification
+    portfolio_sectors = CATALOG.sectors_of(valid_portfolio)
+    same_sector_stocks = CATALOG.in_sectors(portfolio_sectors)
     
-    # Fetch stock data
-    stock_data = {}
+    # Precomputed universe correlations: no download or concat
+    similar_by_stock = similar_for(valid_portfolio)
+    if similar_by_stock is not None:
+        unique_recommendations = _select_recommendations(
+            similar_by_stock, same_sector_stocks, max_recommendations
+        )
+        if unique_recommendations:
+            return {
+                "portfolio": valid_portfolio,
+                "recommendations": unique_recommendations,
+                "success": True,
+                "note": "Based on your investment profile 🔍"
+            }
+    
+    # Fetch all portfolio stocks in one batch
+    try:
+        all_data, _ = get_stock_data_many(valid_portfolio)
+    except Exception:
+        all_data = pd.DataFrame()
     
-    # First fetch portfolio stocks
-    for stock in valid_portfolio:
+    # Add popular stocks if needed
+    if all_data.shape[1] < 2:
+        candidates = [s for s in popular_stocks if s not in all_data.columns and s not in valid_portfolio]
         try:
-            df = get_stock_data(stock)
-            if df is not None and not isinstance(df, dict) and not df.empty:
-                stock_data[stock] = df
+            extra_data, _ = get_stock_data_many(candidates)
+            extra_data = extra_data.iloc[:, :max(0, 5 - all_data.shape[1])]  # Stop after we have enough
+            all_data = pd.concat([all_data, extra_data], axis=1)
         except Exception:
             pass
     
-    # Add popular stocks if needed
-    if len(stock_data) < 2:
-        for stock in popular_stocks:
-            if stock not in stock_data and stock not in valid_portfolio:
-                try:
-                    df = get_stock_data(stock)
-                    if df is not None and not isinstance(df, dict) and not df.empty:
-                        stock_data[stock] = df
-                        if len(stock_data) >= 5:  # Stop after we have enough
-                            break
-                except Exception:
-                    pass
-    
     # Use fallback if not enough data
-    if len(stock_data) < 2:
+    if all_data.shape[1] < 2:
         fallbacks = []
         for s in popular_stocks:
             if s not in valid_portfolio and len(fallbacks) < max_recommendations:
-                stock_info = company_data.get(s, {"name": s.replace(".NS", ""), "sector": "Unknown"})
+                stock_info = CATALOG.info(s)
                 
                 # Choose appropriate explanation type based on stock characteristics
-                if stock_info.get("stability") in ["high", "very high"]:
+                if s in STABLE_STOCKS:
                     explanation_type = "blue_chip"
-                elif stock_info.get("dividend") in ["good", "excellent"]:
+                elif s in DIVIDEND_STOCKS:
                     explanation_type = "dividend"
-                elif stock_info.get("growth") in ["good", "high"]:
+                elif s in GROWTH_STOCKS:
                     explanation_type = "growth"
                 else:
                     explanation_type = "blue_chip"
@@ -129,21 +138,14 @@ def get_recommendations(user_portfolio, max_recommendations=3):
     
     try:
         # Align data to common dates
-        all_data = pd.concat([df for df in stock_data.values()], axis=1)
         all_data = all_data.dropna()
         
-        # Identify portfolio sectors to suggest diversification
-        portfolio_sectors = set()
-        for stock in valid_portfolio:
-            if stock in company_data:
-                portfolio_sectors.add(company_data[stock]["sector"])
-        
         # Compute correlation if we have enough data
         if all_data.shape[0] > 30 and all_data.shape[1] >= 2:
-            correlation_matrix = all_data.corr()
+            correlation_matrix = _daily_returns(all_data).corr()
             
             # Find recommendations based on correlation
-            recommendations = []
+            similar_by_stock = {}
             
             for stock in valid_portfolio:
                 if stock in correlation_matrix.columns:
@@ -154,69 +156,11 @@ def get_recommendations(user_portfolio, max_recommendations=3):
                     external_correlations = correlations[~correlations.index.isin(valid_portfolio)]
                     
                     if not external_correlations.empty:
-                        top_similar = external_correlations.sort_values(ascending=False).head(2)
-                        
-                        for similar_stock, correlation in top_similar.items():
-                            similar_stock_info = company_data.get(similar_stock, {"name": similar_stock.replace(".NS", ""), "sector": "Unknown"})
-                            portfolio_stock_info = company_data.get(stock, {"name": stock.replace(".NS", ""), "sector": "Unknown"})
-                            
-                            # Choose explanation type based on stock characteristics and portfolio context
-                            if similar_stock_info.get("sector") not in portfolio_sectors:
-                                explanation_type = "sector_diversification"
-                                reason_prefix = f"Adds a new sector ({similar_stock_info.get('sector')}) to your portfolio: "
-                            elif similar_stock_info.get("stability") in ["high", "very high"]:
-                                explanation_type = "blue_chip"
-                                reason_prefix = ""
-                            elif similar_stock_info.get("dividend") in ["good", "excellent"]:
-                                explanation_type = "dividend"
-                                reason_prefix = ""
-                            elif similar_stock_info.get("growth") in ["good", "high"]:
-                                explanation_type = "growth"
-                                reason_prefix = ""
-                            elif similar_stock_info.get("risk") in ["low", "very low"]:
-                                explanation_type = "defensive"
-                                reason_prefix = ""
-                            else:
-                                explanation_type = "growth"
-                                reason_prefix = ""
-                            
-                            reason = reason_prefix + random.choice(beginner_explanations[explanation_type])
-                            
-                            # Add specific details about the relationship with existing stocks
-                            if correlation > 0.6:
-                                relationship = f"Similar performance patterns to {portfolio_stock_info.get('name')} in your portfolio, but may offer different advantages"
-                            else:
-                                relationship = f"Performs differently than {portfolio_stock_info.get('name')}, adding valuable diversity to your investments"
-                            
-                            recommendations.append({
-                                "ticker": similar_stock,
-                                "hint": f"{similar_stock_info.get('sector')} sector",
-                                "reason": f"{reason} • {relationship}",
-                                "correlation": correlation,
-                                "relatedTo": stock,
-                                "sector": similar_stock_info.get("sector")
-                            })
-            
-            # Get unique recommendations (by ticker) and ensure sector diversity
-            unique_tickers = set()
-            unique_sectors = set()
-            unique_recommendations = []
-            
-            # First pass: get high-quality diverse recommendations
-            for rec in sorted(recommendations, key=lambda x: x['correlation'], reverse=True):
-                if rec['ticker'] not in unique_tickers and len(unique_recommendations) < max_recommendations:
-                    # Prioritize sector diversity
-                    if rec['sector'] not in unique_sectors or len(unique_sectors) >= 3:
-                        unique_tickers.add(rec['ticker'])
-                        unique_sectors.add(rec['sector'])
-                        unique_recommendations.append(rec)
+                        similar_by_stock[stock] = list(external_correlations.sort_values(ascending=False).head(2).items())
             
-            # Second pass: fill any remaining slots
-            if len(unique_recommendations) < max_recommendations:
-                for rec in sorted(recommendations, key=lambda x: x['correlation'], reverse=True):
-                    if rec['ticker'] not in unique_tickers and len(unique_recommendations) < max_recommendations:
-                        unique_tickers.add(rec['ticker'])
-                        unique_recommendations.append(rec)
+            unique_recommendations = _select_recommendations(
+                similar_by_stock, same_sector_stocks, max_recommendations
+            )
             
             if unique_recommendations:
                 return {
@@ -230,15 +174,15 @@ def get_recommendations(user_portfolio, max_recommendations=3):
         fallbacks = []
         for s in popular_stocks:
             if s not in valid_portfolio and len(fallbacks) < max_recommendations:
-                stock_info = company_data.get(s, {"name": s.replace(".NS", ""), "sector": "Unknown"})
+                stock_info = CATALOG.info(s)
                 
-                if stock_info.get("sector") not in portfolio_sectors and len(portfolio_sectors) > 0:
+                if s not in same_sector_stocks and len(portfolio_sectors) > 0:
                     explanation_type = "sector_diversification"
                     reason_prefix = f"Adds a new sector ({stock_info.get('sector')}) to your portfolio: "
-                elif stock_info.get("stability") in ["high", "very high"]:
+                elif s in STABLE_STOCKS:
                     explanation_type = "blue_chip"
                     reason_prefix = ""
-                elif stock_info.get("dividend") in ["good", "excellent"]:
+                elif s in DIVIDEND_STOCKS:
                     explanation_type = "dividend"
                     reason_prefix = ""
                 else:
@@ -265,14 +209,14 @@ def get_recommendations(user_portfolio, max_recommendations=3):
         fallbacks = []
         for s in popular_stocks:
             if s not in valid_portfolio and len(fallbacks) < max_recommendations:
-                stock_info = company_data.get(s, {"name": s.replace(".NS", ""), "sector": "Unknown"})
+                stock_info = CATALOG.info(s)
                 
                 # Choose explanation for this fallback
-                if stock_info.get("stability") in ["high", "very high"]:
+                if s in STABLE_STOCKS:
                     explanation = "A safe, established company that's perfect for beginners 🔵"
-                elif stock_info.get("dividend") in ["good", "excellent"]:
+                elif s in DIVIDEND_STOCKS:
                     explanation = "Provides regular income through dividend payments 💰"
-                elif stock_info.get("growth") in ["good", "high"]:
+                elif s in GROWTH_STOCKS:
                     explanation = "Shows strong growth potential for long-term investors 📈"
                 else:
                     explanation = "A well-regarded company that's suitable for new investors 👍"
@@ -288,4 +232,134 @@ def get_recommendations(user_portfolio, max_recommendations=3):
             "recommendations": fallbacks,
             "success": True,
             "note": "Based on beginner-friendly stocks 🔍"
-        }
\ No newline at end of file
+        }
+
+def get_recommendations_batch(portfolios, max_recommendations=3):
+    """
+    Get recommendations for many portfolios from one shared computation
+
+    Each portfolio gets exactly what get_recommendations returns for it, but
+    the expensive parts are shared: the precomputed correlations are searched
+    once for the union of all holdings, and portfolios that fall through to
+    live correlation have all their holdings downloaded in one batch up
+    front, so their own fetches are served from the cache.
+
+    Args:
+        portfolios: Dictionary of key (e.g. email) -> list of stock symbols
+
+    Returns a dictionary of key -> the same response as get_recommendations
+    """
+    cleaned = {
+        key: [s.strip() for s in stocks if s and s.strip()]
+        for key, stocks in portfolios.items()
+    }
+    union = list(dict.fromkeys(t for stocks in cleaned.values() for t in stocks))
+
+    precomputed = get_similarity_index() or get_correlation_matrix()
+    if precomputed is None:
+        similar_for = lambda portfolio: None
+    else:
+        # Enough neighbours per ticker that two remain after removing any one portfolio
+        depth = 2 + max((len(set(stocks)) for stocks in cleaned.values()), default=0)
+        neighbours = precomputed.search(union, depth)
+
+        def similar_for(portfolio):
+            held = set(portfolio)
+            return {
+                stock: [(t, c) for t, c in neighbours.get(stock, []) if t not in held][:2]
+                for stock in portfolio if stock in precomputed
+            }
+
+    # Portfolios without precomputed neighbours fall back to live correlation;
+    # download all of their holdings in one batch so their fetches hit the cache
+    live = list(dict.fromkeys(
+        t for stocks in cleaned.values() if not any((similar_for(stocks) or {}).values()) for t in stocks
+    ))
+    if live:
+        try:
+            get_stock_data_many(live)
+        except Exception:
+            pass
+
+    return {
+        key: get_recommendations(portfolio, max_recommendations, similar_for)
+        for key, portfolio in cleaned.items()
+    }
+
+def _select_recommendations(similar_by_stock, same_sector_stocks, max_recommendations):
+    """
+    Turn the most correlated stocks for each portfolio holding into explained,
+    sector-diverse recommendations
+
+    Args:
+        similar_by_stock: Dictionary of portfolio stock -> list of (similar stock, correlation)
+        same_sector_stocks: Catalog tickers in the sectors the portfolio already holds
+    """
+    beginner_explanations = CATALOG.explanations
+    recommendations = []
+    
+    for stock, top_similar in similar_by_stock.items():
+        for similar_stock, correlation in top_similar:
+            similar_stock_info = CATALOG.info(similar_stock)
+            portfolio_stock_info = CATALOG.info(stock)
+
+            # Choose explanation type based on stock characteristics and portfolio context;
+            # tickers outside the catalog have no known sector to diversify into
+            if similar_stock in CATALOG and similar_stock not in same_sector_stocks:
+                explanation_type = "sector_diversification"
+                reason_prefix = f"Adds a new sector ({similar_stock_info.get('sector')}) to your portfolio: "
+            elif similar_stock in STABLE_STOCKS:
+                explanation_type = "blue_chip"
+                reason_prefix = ""
+            elif similar_stock in DIVIDEND_STOCKS:
+                explanation_type = "dividend"
+                reason_prefix = ""
+            elif similar_stock in GROWTH_STOCKS:
+                explanation_type = "growth"
+                reason_prefix = ""
+            elif similar_stock in DEFENSIVE_STOCKS:
+                explanation_type = "defensive"
+                reason_prefix = ""
+            else:
+                explanation_type = "growth"
+                reason_prefix = ""
+
+            reason = reason_prefix + random.choice(beginner_explanations[explanation_type])
+
+            # Add specific details about the relationship with existing stocks
+            if correlation > 0.6:
+                relationship = f"Similar performance patterns to {portfolio_stock_info.get('name')} in your portfolio, but may offer different advantages"
+            else:
+                relationship = f"Performs differently than {portfolio_stock_info.get('name')}, adding valuable diversity to your investments"
+
+            recommendations.append({
+                "ticker": similar_stock,
+                "hint": f"{similar_stock_info.get('sector')} sector",
+                "reason": f"{reason} • {relationship}",
+                "correlation": correlation,
+                "relatedTo": stock,
+                "sector": similar_stock_info.get("sector")
+            })
+
+    # Get unique recommendations (by ticker) and ensure sector diversity
+    unique_tickers = set()
+    unique_sectors = set()
+    unique_recommendations = []
+
+    # First pass: get high-quality diverse recommendations
+    for rec in sorted(recommendations, key=lambda x: x['correlation'], reverse=True):
+        if rec['ticker'] not in unique_tickers and len(unique_recommendations) < max_recommendations:
+            # Prioritize sector diversity
+            if rec['sector'] not in unique_sectors or len(unique_sectors) >= 3:
+                unique_tickers.add(rec['ticker'])
+                unique_sectors.add(rec['sector'])
+                unique_recommendations.append(rec)
+
+    # Second pass: fill any remaining slots
+    if len(unique_recommendations) < max_recommendations:
+        for rec in sorted(recommendations, key=lambda x: x['correlation'], reverse=True):
+            if rec['ticker'] not in unique_tickers and len(unique_recommendations) < max_recommendations:
+                unique_tickers.add(rec['ticker'])
+                unique_recommendations.append(rec)
+
+    return unique_recommendations
\ No newline at end of file
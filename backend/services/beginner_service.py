@@ -2,11 +2,12 @@
 
 import random
 from datetime import datetime
-import pandas as pd
-import numpy as np
-import yfinance as yf
-from services.stock_data import get_stock_data
-from utils.stock_utils import get_stock_metrics
+from services.catalog import get_catalog
+from utils.lazy import lazy_import
+
+# Only the recommendation and market overview endpoints need market data
+stock_data = lazy_import("services.stock_data")
+market_data = lazy_import("services.market_data")
 
 def assess_risk_profile(answers):
     """
@@ -146,23 +147,17 @@ def get_beginner_recommendations(risk_profile="moderate", budget=None):
     # Get allocation for the given profile (default to moderate)
     allocation = profile_allocations.get(risk_profile, profile_allocations["moderate"])
     
-    # Popular Indian stocks by category
-    safe_stocks = ["HDFCBANK.NS", "HINDUNILVR.NS", "NESTLEIND.NS", "BAJAJ-AUTO.NS", "ITC.NS"]
-    moderate_stocks = ["TCS.NS", "INFY.NS", "ICICIBANK.NS", "AXISBANK.NS", "RELIANCE.NS"]
-    growth_stocks = ["TATAMOTORS.NS", "TATASTEEL.NS", "ADANIENT.NS", "BHARTIARTL.NS", "ZOMATO.NS"]
+    # Popular Indian stocks by category, from the shared catalog
+    picks = get_catalog().beginner_picks
+    safe_stocks, moderate_stocks, growth_stocks = picks["safe"], picks["moderate"], picks["growth"]
     
     # Get additional stock metrics for better recommendations
     # We'll fetch at least 3 from each category to have enough choices
     stocks_to_analyze = safe_stocks[:3] + moderate_stocks[:3] + growth_stocks[:3]
-    analyzed_stocks = {}
-    
-    for ticker in stocks_to_analyze:
-        try:
-            data = get_stock_data(ticker, 2, with_metrics=True)
-            if data and "error" not in data:
-                analyzed_stocks[ticker] = data
-        except Exception:
-            continue
+    try:
+        analyzed_stocks, _ = stock_data.get_stock_data_many(stocks_to_analyze, 2, with_metrics=True)
+    except Exception:
+        analyzed_stocks = {}
     
     # If we don't have enough stocks, use our default lists
     if len(analyzed_stocks) < 5:
@@ -314,17 +309,14 @@ def get_market_overview():
     """
     try:
         # Get major Indian indices
-        indices = {
-            "NIFTY 50": {"ticker": "^NSEI", "nickname": "Main Indian Index"},
-            "SENSEX": {"ticker": "^BSESN", "nickname": "Bombay Stock Exchange Index"},
-            "NIFTY BANK": {"ticker": "NIFTY_BANK.NS", "nickname": "Banking Sector Index"}
-        }
+        catalog = get_catalog()
+        indices = {index["name"]: index for index in catalog.indices}
         
         # Fetch latest data for each index
         market_summary = []
         for name, data in indices.items():
             try:
-                index_data = yf.Ticker(data["ticker"]).history(period="5d")
+                index_data = market_data.get_provider().history(data["ticker"], period="5d")
                 if not index_data.empty:
                     latest = index_data.iloc[-1]
                     previous = index_data.iloc[-2]
@@ -343,39 +335,9 @@ def get_market_overview():
             except Exception as e:
                 print(f"Error fetching index {name}: {str(e)}")
         
-        # Create a list of trending sectors with simple explanations
+        # Trending sectors with simple explanations, from the catalog
         # This would ideally come from actual sector performance data
-        # For now, we'll use a few key sectors with simplified explanations
-        trending_sectors = [
-            {
-                "name": "IT/Technology",
-                "description": "Companies that make software or provide tech services",
-                "beginner_friendliness": 4,
-                "example_stocks": ["TCS.NS", "INFY.NS", "WIPRO.NS"],
-                "emoji": "💻"
-            },
-            {
-                "name": "Banking & Finance",
-                "description": "Banks and financial service companies",
-                "beginner_friendliness": 3,
-                "example_stocks": ["HDFCBANK.NS", "ICICIBANK.NS", "SBIN.NS"],
-                "emoji": "🏦"
-            },
-            {
-                "name": "Consumer Goods",
-                "description": "Companies that make everyday products",
-                "beginner_friendliness": 5,
-                "example_stocks": ["HINDUNILVR.NS", "ITC.NS", "NESTLEIND.NS"],
-                "emoji": "🛒"
-            },
-            {
-                "name": "Pharma & Healthcare",
-                "description": "Medicine and healthcare companies",
-                "beginner_friendliness": 3,
-                "example_stocks": ["SUNPHARMA.NS", "DRREDDY.NS", "CIPLA.NS"],
-                "emoji": "💊"
-            }
-        ]
+        trending_sectors = [dict(group) for group in catalog.sector_groups]
         
         # Add helpful messages about market conditions for beginners
         if len(market_summary) > 0:
@@ -0,0 +1,84 @@
+"""
+Universe catalog: company details, curated lists and explanation texts
+
+Loaded once from a JSON data file and shared by recommendations, beginner
+recommendations and the market overview. Each attribute (sector, stability,
+growth, dividend, risk) is indexed as value -> frozenset of tickers, so
+questions like "stocks outside the portfolio's sectors" are set operations
+rather than scans over the whole catalog.
+"""
+import os
+import json
+import threading
+
+# Ships with the code, so the default doesn't depend on the working directory
+CATALOG_PATH = os.environ.get(
+    "INVESTEZY_CATALOG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "catalog.json")
+)
+
+# Attributes indexed as value -> set of tickers
+INDEXED_ATTRIBUTES = ("sector", "stability", "growth", "dividend", "risk")
+
+
+class Catalog:
+    """Read-only catalog with per-attribute ticker indexes"""
+
+    def __init__(self, data):
+        self.stocks = data["stocks"]
+        self.tickers = frozenset(self.stocks)
+        self.popular = list(data.get("popular", []))
+        # Nifty 50 large caps: the LSTM training set and the nightly forecast universe
+        self.large_caps = list(data.get("largeCaps", []))
+        self.beginner_picks = {k: list(v) for k, v in data.get("beginnerPicks", {}).items()}
+        self.indices = list(data.get("indices", []))
+        self.sector_groups = list(data.get("sectorGroups", []))
+        self.explanations = data.get("explanations", {})
+
+        indexes = {attribute: {} for attribute in INDEXED_ATTRIBUTES}
+        for ticker, info in self.stocks.items():
+            for attribute in INDEXED_ATTRIBUTES:
+                if attribute in info:
+                    indexes[attribute].setdefault(info[attribute], set()).add(ticker)
+        self._indexes = {
+            attribute: {value: frozenset(tickers) for value, tickers in values.items()}
+            for attribute, values in indexes.items()
+        }
+
+    def __contains__(self, ticker):
+        return ticker in self.stocks
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def info(self, ticker):
+        """Company details, with a name derived from the symbol for unknown tickers"""
+        return self.stocks.get(ticker, {"name": ticker.replace(".NS", ""), "sector": "Unknown"})
+
+    def with_attribute(self, attribute, *values):
+        """Tickers whose attribute is any of values"""
+        index = self._indexes[attribute]
+        return frozenset().union(*(index.get(value, frozenset()) for value in values))
+
+    def in_sectors(self, sectors):
+        """Tickers in any of the given sectors"""
+        return self.with_attribute("sector", *sectors)
+
+    def sectors_of(self, tickers):
+        """Sectors of the catalogued tickers among `tickers`"""
+        return {self.stocks[t]["sector"] for t in self.tickers.intersection(tickers)}
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """The catalog, loaded from CATALOG_PATH on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                with open(CATALOG_PATH, encoding="utf-8") as f:
+                    _catalog = Catalog(json.load(f))
+    return _catalog
@@ -0,0 +1,319 @@
+"""
+Universe-wide correlation of daily returns
+
+The matrix covers the recommendation universe over the last WINDOW trading
+days. It is stored on disk with the co-moment sums it was computed from, so
+each new day of returns is a rank-1 update (add the new day, drop the oldest)
+instead of a full recompute. Recommendations read rows from it directly.
+
+Rebuild or update by hand with:
+    python -m services.correlation [--rebuild] [TICKER ...]
+"""
+import os
+import sys
+import time
+import threading
+import numpy as np
+from services import price_store
+from services.scheduler import schedule_daily
+
+CORRELATION_PATH = os.environ.get("INVESTEZY_CORRELATION", "store/correlation.npz")
+
+# Trading days of returns the correlation is computed over
+WINDOW = int(os.environ.get("INVESTEZY_CORR_WINDOW", 252))
+
+# Pairs with fewer common days than this get no correlation (NaN)
+MIN_OVERLAP = 30
+
+# Rank-1 updates slowly accumulate rounding error; recompute from scratch after this many
+MAX_INCREMENTAL_UPDATES = 250
+
+# After the metrics job (16:15 IST)
+REFRESH_HOUR, REFRESH_MINUTE = 16, 30
+
+
+def returns_panel(bars, tickers, since_day=None):
+    """
+    Daily returns for tickers aligned on the union of their dates
+
+    Each ticker's return is computed between its own consecutive bars, then
+    placed on the shared date axis (NaN where it has no bar).
+
+    Returns:
+        (days, returns) with days a sorted int array and returns (days x tickers)
+    """
+    per_ticker = []
+    for ticker in tickers:
+        rows = bars.get(ticker)
+        if rows is None or len(rows) < 2:
+            per_ticker.append((np.empty(0, dtype=np.int64), np.empty(0)))
+            continue
+        if since_day is not None:
+            # Keep one bar before since_day so its first return can be computed
+            first = max(0, int(np.searchsorted(rows[:, 0], since_day)) - 1)
+            rows = rows[first:]
+        closes = rows[:, 4]
+        per_ticker.append((rows[1:, 0].astype(np.int64), closes[1:] / closes[:-1] - 1))
+
+    days = np.unique(np.concatenate([d for d, _ in per_ticker])) if per_ticker else np.empty(0, dtype=np.int64)
+    if since_day is not None:
+        days = days[days >= since_day]
+    returns = np.full((len(days), len(tickers)), np.nan)
+    for j, (ticker_days, ticker_returns) in enumerate(per_ticker):
+        positions = np.searchsorted(days, ticker_days)
+        inside = (positions < len(days)) & (days[np.minimum(positions, len(days) - 1)] == ticker_days)
+        returns[positions[inside], j] = ticker_returns[inside]
+    return days, returns
+
+
+class CorrelationMatrix:
+    """
+    Pairwise correlation of returns kept alongside its co-moment sums
+
+    For a window of return rows X (NaN = missing) with mask M, pairwise
+    statistics over the days both tickers traded are:
+        n   = M'M            sx  = X0'M   (sum of i over days j traded)
+        sxy = X0'X0          sxx = (X0^2)'M
+    Adding or removing a day is a rank-1 update of each.
+    """
+
+    def __init__(self, tickers, window=WINDOW):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.window = window
+        k = len(self.tickers)
+        self.days = np.empty(0, dtype=np.int64)
+        self.returns = np.empty((0, k))
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+        self.matrix = np.full((k, k), np.nan)
+        self.updates = 0
+
+    def __contains__(self, ticker):
+        return ticker in self.index
+
+    def _apply(self, row, sign):
+        mask = (~np.isnan(row)).astype(np.float64)
+        x = np.nan_to_num(row)
+        self.n += sign * np.outer(mask, mask)
+        self.sx += sign * np.outer(x, mask)
+        self.sxx += sign * np.outer(x * x, mask)
+        self.sxy += sign * np.outer(x, x)
+
+    def _recompute_sums(self):
+        mask = (~np.isnan(self.returns)).astype(np.float64)
+        x = np.nan_to_num(self.returns)
+        self.n = mask.T @ mask
+        self.sx = x.T @ mask
+        self.sxx = (x * x).T @ mask
+        self.sxy = x.T @ x
+        self.updates = 0
+
+    def _finish(self):
+        """Correlation from the co-moment sums"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = self.n * self.sxy - self.sx * self.sx.T
+            var_i = self.n * self.sxx - self.sx ** 2
+            corr = cov / np.sqrt(var_i * var_i.T)
+        corr[self.n < MIN_OVERLAP] = np.nan
+        np.fill_diagonal(corr, 1.0)
+        self.matrix = np.clip(corr, -1.0, 1.0)
+
+    def rebuild(self, days, returns):
+        """Compute from scratch over the last `window` rows of returns"""
+        self.days = np.asarray(days[-self.window:], dtype=np.int64)
+        self.returns = np.array(returns[-self.window:], dtype=np.float64)
+        self._recompute_sums()
+        self._finish()
+
+    def append(self, days, returns):
+        """
+        Add new days of returns, dropping the oldest ones beyond the window
+
+        Stored days from the first given day on are replaced rather than
+        skipped, so a day first seen as a partial intraday bar is corrected
+        once its final close is in. Returns the number of new days.
+        """
+        if len(days) == 0:
+            return 0
+        replaced = self.days >= days[0]
+        for row in self.returns[replaced]:
+            self._apply(row, -1)
+        self.days, self.returns = self.days[~replaced], self.returns[~replaced]
+        added = len(days) - int(replaced.sum())
+
+        for row in returns:
+            self._apply(row, 1)
+        self.days = np.concatenate([self.days, days])
+        self.returns = np.vstack([self.returns, returns])
+
+        overflow = len(self.days) - self.window
+        for row in self.returns[:max(0, overflow)]:
+            self._apply(row, -1)
+        if overflow > 0:
+            self.days = self.days[overflow:]
+            self.returns = self.returns[overflow:]
+
+        self.updates += len(days)
+        if self.updates > MAX_INCREMENTAL_UPDATES:
+            self._recompute_sums()
+        self._finish()
+        return added
+
+    def row(self, ticker):
+        """Correlations of one ticker with every ticker in the universe (a view)"""
+        return self.matrix[self.index[ticker]]
+
+    def top_k(self, ticker, k=2, exclude=(), largest=True):
+        """
+        The k tickers most (or least) correlated with `ticker`
+
+        Returns a list of (ticker, correlation), skipping `ticker` itself,
+        anything in `exclude`, and pairs without enough overlap.
+        """
+        scores = np.array(self.row(ticker))
+        scores[self.index[ticker]] = np.nan
+        for other in exclude:
+            if other in self.index:
+                scores[self.index[other]] = np.nan
+        if not largest:
+            scores = -scores
+
+        candidates = np.flatnonzero(~np.isnan(scores))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.tickers[i], float(self.matrix[self.index[ticker], i])) for i in candidates]
+
+    def search(self, tickers, k=2, exclude=(), largest=True):
+        """
+        top_k for several tickers from one slice of the matrix
+
+        Returns a dictionary of ticker -> list of (ticker, correlation), best
+        first, for the tickers that are in the universe.
+        """
+        queries = list(dict.fromkeys(t for t in tickers if t in self.index))
+        if not queries:
+            return {}
+        rows = np.array([self.index[t] for t in queries])
+        scores = np.array(self.matrix[rows])
+        scores[np.arange(len(rows)), rows] = np.nan
+        scores[:, [self.index[t] for t in exclude if t in self.index]] = np.nan
+        if not largest:
+            scores = -scores
+        scores = np.where(np.isnan(scores), -np.inf, scores)
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < scores.shape[1] else np.tile(
+            np.arange(scores.shape[1]), (len(rows), 1)
+        )
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+
+        results = {}
+        for row, ticker in enumerate(queries):
+            results[ticker] = [
+                (self.tickers[i], float(self.matrix[rows[row], i]))
+                for i in top[row] if np.isfinite(scores[row, i])
+            ]
+        return results
+
+    def save(self, path=CORRELATION_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path, tickers=np.array(self.tickers), window=self.window, days=self.days,
+            returns=self.returns, n=self.n, sx=self.sx, sxx=self.sxx, sxy=self.sxy,
+            matrix=self.matrix, updates=self.updates
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=CORRELATION_PATH):
+        with np.load(path) as data:
+            corr = cls([str(t) for t in data["tickers"]], int(data["window"]))
+            corr.days = data["days"]
+            corr.returns = data["returns"]
+            corr.n, corr.sx, corr.sxx, corr.sxy = data["n"], data["sx"], data["sxx"], data["sxy"]
+            corr.matrix = data["matrix"]
+            corr.updates = int(data["updates"])
+        return corr
+
+
+def refresh_correlation(tickers, rebuild=False, window=WINDOW):
+    """
+    Bring the stored correlation matrix up to date with the price store
+
+    Rebuilds from scratch when asked, when nothing is stored yet or when the
+    universe changed; otherwise appends the days since the last update,
+    replacing the last stored day in case it came from a partial bar.
+    """
+    started = time.time()
+    tickers = list(dict.fromkeys(tickers))
+    bars, errors = price_store.sync_many(tickers)
+
+    corr = None
+    if not rebuild and os.path.exists(CORRELATION_PATH):
+        try:
+            corr = CorrelationMatrix.load()
+        except (OSError, ValueError, KeyError):
+            corr = None
+    if corr is not None and (corr.tickers != tickers or corr.window != window or len(corr.days) == 0):
+        corr = None
+
+    if corr is None:
+        corr = CorrelationMatrix(tickers, window)
+        days, returns = returns_panel(bars, tickers)
+        corr.rebuild(days, returns)
+        added = len(corr.days)
+    else:
+        days, returns = returns_panel(bars, tickers, since_day=int(corr.days[-1]))
+        added = corr.append(days, returns)
+
+    corr.save()
+    print(f"Correlation refresh: {len(tickers)} tickers, {added} new days, "
+          f"{len(errors)} errors in {time.time() - started:.2f}s")
+    return corr
+
+
+_cached = None
+_cached_mtime = None
+_cache_lock = threading.Lock()
+
+
+def get_correlation_matrix():
+    """The stored correlation matrix, reloaded when the file changes (None if missing)"""
+    global _cached, _cached_mtime
+    try:
+        mtime = os.path.getmtime(CORRELATION_PATH)
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached is None or mtime != _cached_mtime:
+            try:
+                _cached = CorrelationMatrix.load(CORRELATION_PATH)
+                _cached_mtime = mtime
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load correlation matrix: {str(e)}")
+                return _cached
+        return _cached
+
+
+def schedule_refresh(tickers):
+    """Append each trading day's returns after market close"""
+    return schedule_daily(
+        "correlation", REFRESH_HOUR, REFRESH_MINUTE, lambda: refresh_correlation(tickers)
+    )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rebuild = "--rebuild" in args
+    args = [a for a in args if a != "--rebuild"]
+    if not args:
+        from models.recommendation import RECOMMENDATION_UNIVERSE
+        args = RECOMMENDATION_UNIVERSE
+    refresh_correlation(args, rebuild=rebuild)
@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import threading
+from services.market_data import get_provider
+
+# Company name, P/E, dividend yield and market cap for every ticker we've seen
+FUNDAMENTALS_PATH = os.environ.get("INVESTEZY_FUNDAMENTALS", "store/fundamentals.json")
+
+# Fundamentals change at most daily; refresh entries older than this
+MAX_AGE = int(os.environ.get("INVESTEZY_FUNDAMENTALS_MAX_AGE", 24 * 60 * 60))
+
+# How often the background thread wakes up to look for stale entries
+CHECK_INTERVAL = 60
+
+FIELDS = ["longName", "trailingPE", "dividendYield", "marketCap"]
+
+_records = {}
+_pending = set()
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_loaded_mtime = None
+_refresher = None
+
+
+def _load_from_disk():
+    """Merge records from disk, keeping whichever copy is newer"""
+    global _loaded_mtime
+    try:
+        mtime = os.path.getmtime(FUNDAMENTALS_PATH)
+        if mtime == _loaded_mtime:
+            return
+        with open(FUNDAMENTALS_PATH) as f:
+            records = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    with _lock:
+        for ticker, record in records.items():
+            current = _records.get(ticker)
+            if current is None or current.get("updatedAt", 0) < record.get("updatedAt", 0):
+                _records[ticker] = record
+        _loaded_mtime = mtime
+
+
+def _save_to_disk():
+    global _loaded_mtime
+    os.makedirs(os.path.dirname(FUNDAMENTALS_PATH) or ".", exist_ok=True)
+    with _lock:
+        data = json.dumps(_records)
+    tmp_path = f"{FUNDAMENTALS_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(data)
+    os.replace(tmp_path, FUNDAMENTALS_PATH)
+    _loaded_mtime = os.path.getmtime(FUNDAMENTALS_PATH)
+
+
+def _fetch(ticker):
+    info = get_provider().info(ticker) or {}
+    record = {field: info.get(field) for field in FIELDS}
+    record["updatedAt"] = time.time()
+    return record
+
+
+def _is_stale(record):
+    return record is None or time.time() - record.get("updatedAt", 0) > MAX_AGE
+
+
+def refresh(tickers=None):
+    """
+    Fetch fundamentals for the given tickers (default: all stale or pending ones)
+
+    Failures keep the old record so readers carry on with stale values.
+    Returns the number of tickers refreshed.
+    """
+    _load_from_disk()
+    with _lock:
+        if tickers is None:
+            tickers = set(_pending) | {t for t, r in _records.items() if _is_stale(r)}
+        _pending.difference_update(tickers)
+
+    refreshed = 0
+    for ticker in tickers:
+        try:
+            record = _fetch(ticker)
+        except Exception as e:
+            print(f"Fundamentals refresh failed for {ticker}: {str(e)}")
+            continue
+        with _lock:
+            _records[ticker] = record
+        refreshed += 1
+
+    if refreshed:
+        _save_to_disk()
+    return refreshed
+
+
+def _refresh_loop():
+    while True:
+        _wakeup.wait(CHECK_INTERVAL)
+        _wakeup.clear()
+        try:
+            refresh()
+        except Exception as e:
+            print(f"Fundamentals refresh error: {str(e)}")
+
+
+def start_background_refresh():
+    """Load stored fundamentals and start the refresh thread (idempotent)"""
+    global _refresher
+    with _lock:
+        if _refresher is not None:
+            return
+        _refresher = threading.Thread(target=_refresh_loop, name="fundamentals-refresh", daemon=True)
+    _load_from_disk()
+    _refresher.start()
+    _wakeup.set()
+
+
+def get_fundamentals(ticker):
+    """
+    Get stored fundamentals for a ticker without touching the network
+
+    Missing or stale tickers are queued for the background refresher and
+    whatever is stored (possibly nothing) is returned immediately. Only the
+    app process runs the refresher (see start_background_refresh); other
+    processes, such as forecast pool workers, read what it saved to disk.
+
+    Returns:
+        Dictionary with longName, trailingPE, dividendYield and marketCap
+        (empty if the ticker has never been fetched)
+    """
+    if _refresher is None:
+        _load_from_disk()
+    with _lock:
+        record = _records.get(ticker)
+        if _is_stale(record) and ticker not in _pending:
+            _pending.add(ticker)
+            _wakeup.set()
+    return {k: v for k, v in (record or {}).items() if k in FIELDS and v is not None}
+
+
+def get_company_name(ticker, default=None):
+    """Company long name from the store, or default (the bare symbol) if unknown"""
+    if default is None:
+        default = ticker.replace(".NS", "")
+    return get_fundamentals(ticker).get("longName", default)
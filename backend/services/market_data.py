@@ -0,0 +1,314 @@
+"""
+Market data providers
+
+Everything that needs prices or company info goes through get_provider().
+The yfinance provider is the default; the replay provider serves recorded
+or synthetic data from local files for load tests and benchmarks.
+
+Record live data for replay:
+    python -m services.market_data record --out replay TCS.NS INFY.NS ^NSEI
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import threading
+import numpy as np
+import pandas as pd
+from utils.resilience import CircuitBreaker, call_with_retry, current_deadline
+
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# Upstream call policy: attempts per call, and when to stop trying altogether
+UPSTREAM_RETRIES = int(os.environ.get("INVESTEZY_UPSTREAM_RETRIES", 3))
+BREAKER_THRESHOLD = int(os.environ.get("INVESTEZY_BREAKER_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(os.environ.get("INVESTEZY_BREAKER_RESET", 30))
+
+# Per-call HTTP timeout when no request deadline is set
+DEFAULT_TIMEOUT = 10
+
+
+def _request_timeout():
+    """HTTP timeout that fits in what is left of the current request budget"""
+    deadline = current_deadline()
+    if deadline is None:
+        return DEFAULT_TIMEOUT
+    return max(0.5, min(DEFAULT_TIMEOUT, deadline.remaining()))
+
+
+class MarketDataProvider:
+    """Interface every market data source implements"""
+
+    name = "base"
+
+    def history(self, ticker, period=None, start=None):
+        """Daily OHLCV bars for one ticker, for a yfinance-style period or from a start date"""
+        raise NotImplementedError
+
+    def download(self, tickers, period=None, start=None):
+        """Daily OHLCV bars for several tickers in one call, as ticker -> DataFrame"""
+        return {ticker: self.history(ticker, period=period, start=start) for ticker in tickers}
+
+    def info(self, ticker):
+        """Company info dictionary (longName, trailingPE, dividendYield, marketCap, ...)"""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance"""
+
+    name = "yfinance"
+
+    def __init__(self):
+        import yfinance as yf
+        self._yf = yf
+
+    def history(self, ticker, period=None, start=None):
+        stock = self._yf.Ticker(ticker)
+        if start is not None:
+            return stock.history(start=start, timeout=_request_timeout())
+        return stock.history(period=period or "1mo", timeout=_request_timeout())
+
+    def download(self, tickers, period=None, start=None):
+        kwargs = {"start": start} if start is not None else {"period": period or "1mo"}
+        data = self._yf.download(
+            tickers, group_by="ticker", auto_adjust=True, actions=False,
+            threads=True, progress=False, timeout=_request_timeout(), **kwargs
+        )
+        frames = {}
+        if data is None or data.empty:
+            return frames
+        if not isinstance(data.columns, pd.MultiIndex):
+            return {tickers[0]: data.dropna(how="all")}
+        for ticker in tickers:
+            if ticker in data.columns.get_level_values(0):
+                frames[ticker] = data[ticker].dropna(how="all")
+        return frames
+
+    def info(self, ticker):
+        return self._yf.Ticker(ticker).info or {}
+
+
+def period_start(period, end):
+    """Translate a yfinance period string ("5d", "2y", "6mo", "max") to a start date"""
+    if not period or period == "max":
+        return None
+    digits, unit = "".join(c for c in period if c.isdigit()), period.lstrip("0123456789")
+    if not digits:
+        raise ValueError(f"Unsupported period: {period}")
+    amount = int(digits)
+    if unit == "d":
+        # Trading days, like yfinance
+        return end - pd.tseries.offsets.BDay(amount)
+    if unit == "wk":
+        return end - pd.DateOffset(weeks=amount)
+    if unit == "mo":
+        return end - pd.DateOffset(months=amount)
+    if unit == "y":
+        return end - pd.DateOffset(years=amount)
+    raise ValueError(f"Unsupported period: {period}")
+
+
+class ReplayProvider(MarketDataProvider):
+    """
+    Serves OHLCV and info data from local files
+
+    Layout of data_dir:
+        <TICKER>.csv          Date,Open,High,Low,Close,Volume
+        info/<TICKER>.json    Company info dictionary
+
+    Tickers without a file get deterministic synthetic data (a random walk
+    seeded by the symbol) unless synthetic=False. Every call sleeps for
+    latency_ms to mimic upstream round-trips.
+    """
+
+    name = "replay"
+
+    def __init__(self, data_dir="replay", latency_ms=0, synthetic=True, synthetic_years=12):
+        self.data_dir = data_dir
+        self.latency = latency_ms / 1000.0
+        self.synthetic = synthetic
+        self.synthetic_years = synthetic_years
+        self._frames = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _sleep(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _path(self, ticker, *parts):
+        return os.path.join(self.data_dir, *parts, ticker.replace(os.sep, "_"))
+
+    def _synthetic_frame(self, ticker):
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        end = pd.Timestamp.today().normalize()
+        index = pd.bdate_range(end=end, periods=252 * self.synthetic_years, name="Date")
+        drift, vol = rng.uniform(-0.0002, 0.0008), rng.uniform(0.008, 0.025)
+        close = rng.uniform(50, 5000) * np.exp(np.cumsum(rng.normal(drift, vol, len(index))))
+        spread = np.abs(rng.normal(0, vol / 2, len(index)))
+        return pd.DataFrame({
+            "Open": close * (1 + rng.normal(0, vol / 4, len(index))),
+            "High": close * (1 + spread),
+            "Low": close * (1 - spread),
+            "Close": close,
+            "Volume": rng.integers(100_000, 10_000_000, len(index)).astype(float)
+        }, index=index)
+
+    def _frame(self, ticker):
+        with self._lock:
+            if ticker in self._frames:
+                return self._frames[ticker]
+
+        path = self._path(ticker) + ".csv"
+        if os.path.exists(path):
+            frame = pd.read_csv(path, index_col="Date", parse_dates=True)
+        elif self.synthetic:
+            frame = self._synthetic_frame(ticker)
+        else:
+            frame = pd.DataFrame(columns=COLUMNS, index=pd.DatetimeIndex([], name="Date"))
+
+        with self._lock:
+            self._frames[ticker] = frame
+        return frame
+
+    def _slice(self, frame, period=None, start=None):
+        if start is not None:
+            return frame[frame.index >= pd.Timestamp(start)]
+        if frame.empty:
+            return frame
+        start = period_start(period or "1mo", frame.index[-1])
+        if start is None:
+            return frame
+        return frame[frame.index > start]
+
+    def history(self, ticker, period=None, start=None):
+        self._sleep()
+        return self._slice(self._frame(ticker), period, start).copy()
+
+    def download(self, tickers, period=None, start=None):
+        # One simulated round-trip for the whole batch
+        self._sleep()
+        frames = {}
+        for ticker in tickers:
+            frame = self._slice(self._frame(ticker), period, start)
+            if not frame.empty:
+                frames[ticker] = frame.copy()
+        return frames
+
+    def info(self, ticker):
+        self._sleep()
+        path = self._path(ticker, "info") + ".json"
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        if not self.synthetic:
+            return {}
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()) + 1)
+        return {
+            "longName": f"{ticker.replace('.NS', '')} (synthetic)",
+            "trailingPE": round(float(rng.uniform(8, 80)), 2),
+            "dividendYield": round(float(rng.uniform(0, 0.04)), 4),
+            "marketCap": float(rng.uniform(1e10, 2e13))
+        }
+
+
+class ResilientProvider(MarketDataProvider):
+    """
+    Wraps a provider with retries, backoff with jitter and a circuit breaker
+
+    Retries stay within the current request's time budget, and while the
+    breaker is open calls fail immediately with CircuitOpenError so callers
+    can fall back to stored data without tying up a worker.
+    """
+
+    def __init__(self, inner, retries=UPSTREAM_RETRIES):
+        self.inner = inner
+        self.name = inner.name
+        self.retries = retries
+        self.breaker = CircuitBreaker(
+            f"market_data:{inner.name}",
+            failure_threshold=BREAKER_THRESHOLD,
+            reset_timeout=BREAKER_RESET_SECONDS
+        )
+
+    def _call(self, fn):
+        return call_with_retry(fn, breaker=self.breaker, retries=self.retries)
+
+    def history(self, ticker, period=None, start=None):
+        return self._call(lambda: self.inner.history(ticker, period=period, start=start))
+
+    def download(self, tickers, period=None, start=None):
+        return self._call(lambda: self.inner.download(tickers, period=period, start=start))
+
+    def info(self, ticker):
+        return self._call(lambda: self.inner.info(ticker))
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def create_provider(name=None):
+    """Build the provider configured by INVESTEZY_PROVIDER (or the given name)"""
+    name = name or os.environ.get("INVESTEZY_PROVIDER", "yfinance")
+    if name == "replay":
+        return ReplayProvider(
+            data_dir=os.environ.get("INVESTEZY_REPLAY_DIR", "replay"),
+            latency_ms=float(os.environ.get("INVESTEZY_REPLAY_LATENCY_MS", 0)),
+            synthetic=os.environ.get("INVESTEZY_REPLAY_SYNTHETIC", "1") != "0"
+        )
+    if name == "yfinance":
+        return YFinanceProvider()
+    raise ValueError(f"Unknown market data provider: {name}")
+
+
+def get_provider():
+    """The process-wide market data provider, with retries and a circuit breaker"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = ResilientProvider(create_provider())
+    return _provider
+
+
+def set_provider(provider):
+    """Swap the process-wide provider (for benchmarks and load tests)"""
+    global _provider
+    with _provider_lock:
+        _provider = ResilientProvider(provider)
+
+
+def record(tickers, out_dir, period="max", provider=None):
+    """Save history and info for tickers in the layout ReplayProvider reads"""
+    provider = provider or YFinanceProvider()
+    os.makedirs(os.path.join(out_dir, "info"), exist_ok=True)
+    for ticker in tickers:
+        try:
+            hist = provider.history(ticker, period=period)
+            if hist.empty:
+                print(f"No data for {ticker}")
+                continue
+            index = pd.DatetimeIndex(hist.index)
+            if index.tz is not None:
+                hist = hist.set_axis(index.tz_localize(None))
+            hist = hist[[c for c in COLUMNS if c in hist]]
+            hist.index.name = "Date"
+            hist.to_csv(os.path.join(out_dir, f"{ticker}.csv"))
+            with open(os.path.join(out_dir, "info", f"{ticker}.json"), "w") as f:
+                json.dump(provider.info(ticker), f, default=str)
+            print(f"Recorded {len(hist)} bars for {ticker}")
+        except Exception as e:
+            print(f"Error recording {ticker}: {str(e)}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "record" and args[1] == "--out":
+        record(args[3:], args[2])
+    else:
+        print(__doc__)
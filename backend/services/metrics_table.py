@@ -0,0 +1,162 @@
+"""
+Materialized per-ticker metrics
+
+A job run after market close computes the full get_stock_metrics output for
+every tracked ticker and every supported horizon, and writes it to a small
+SQLite table. /api/stock and /api/compare then serve straight from it.
+
+Run the job by hand with:
+    python -m services.metrics_table [TICKER ...]
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+from services import price_store
+from services.scheduler import schedule_daily
+from utils.incremental_stats import IncrementalMetrics
+from utils.stock_utils import format_fundamentals
+
+METRICS_DB_PATH = os.environ.get("INVESTEZY_METRICS_DB", "store/metrics.db")
+
+# Running return statistics per ticker and horizon, so a new bar needs no rescan
+INCREMENTAL_STATE_PATH = os.environ.get("INVESTEZY_METRICS_STATE", "store/metrics_state.json")
+
+# Horizons (in years) materialized for every ticker
+HORIZONS = range(1, 11)
+
+# Rows older than this are ignored, in case the job stopped running
+MAX_AGE = int(os.environ.get("INVESTEZY_METRICS_MAX_AGE", 3 * 24 * 60 * 60))
+
+# Run the refresh job at 16:15 IST, after NSE closes at 15:30
+REFRESH_HOUR, REFRESH_MINUTE = 16, 15
+
+
+def _connect():
+    os.makedirs(os.path.dirname(METRICS_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(METRICS_DB_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS metrics ("
+        " ticker TEXT NOT NULL,"
+        " years INTEGER NOT NULL,"
+        " last_bar INTEGER NOT NULL,"
+        " computed_at REAL NOT NULL,"
+        " payload TEXT NOT NULL,"
+        " PRIMARY KEY (ticker, years)"
+        ") WITHOUT ROWID"
+    )
+    return conn
+
+
+def _with_fundamentals(ticker, payload):
+    """Fundamentals change independently of prices, so they're merged in at read time"""
+    metrics = json.loads(payload)
+    metrics["companyName"], metrics["fundamentals"] = format_fundamentals(ticker)
+    return metrics
+
+
+def lookup_many(tickers, years):
+    """
+    Read materialized metrics for several tickers at one horizon
+
+    Returns a dictionary of ticker -> metrics for tickers that have a
+    recent row; the rest should be computed live.
+    """
+    if years not in HORIZONS or not tickers or not os.path.exists(METRICS_DB_PATH):
+        return {}
+    try:
+        conn = _connect()
+        try:
+            placeholders = ",".join("?" * len(tickers))
+            rows = conn.execute(
+                f"SELECT ticker, payload FROM metrics WHERE years = ? AND computed_at > ?"
+                f" AND ticker IN ({placeholders})",
+                [years, time.time() - MAX_AGE, *tickers]
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Metrics table read failed: {str(e)}")
+        return {}
+    return {ticker: _with_fundamentals(ticker, payload) for ticker, payload in rows}
+
+
+def lookup(ticker, years):
+    """Materialized metrics for one ticker, or None"""
+    return lookup_many([ticker], years).get(ticker)
+
+
+def refresh_metrics_table(tickers=None):
+    """
+    Recompute metrics for tickers whose latest bar changed since the last run
+
+    Args:
+        tickers: Tickers to refresh (default: everything in the price store)
+
+    Returns:
+        Dictionary with counts and the time the job took
+    """
+    started = time.time()
+    tickers = list(tickers) if tickers else price_store.stored_tickers()
+    bars, errors = price_store.sync_many(tickers, force=True)
+
+    conn = _connect()
+    try:
+        done = dict(conn.execute("SELECT ticker, MIN(last_bar) FROM metrics GROUP BY ticker").fetchall())
+        counts = dict(conn.execute("SELECT ticker, COUNT(*) FROM metrics GROUP BY ticker").fetchall())
+
+        # Running per-horizon windows: a new bar updates each metric in O(1)
+        engine = IncrementalMetrics.load(INCREMENTAL_STATE_PATH)
+
+        # Only tickers with a new bar, missing horizons or rewritten history
+        # (re-adjusted for a split or dividend) need recomputing
+        stale = {
+            ticker: rows for ticker, rows in bars.items()
+            if rows is not None and len(rows) > 0
+            and (done.get(ticker) != int(rows[-1, 0]) or counts.get(ticker, 0) < len(HORIZONS)
+                 or not engine.is_current(ticker, rows, HORIZONS))
+        }
+
+        records = []
+        now = time.time()
+        for years in HORIZONS:
+            start_day = price_store.window_start_day(years + 1)
+            for ticker, rows in stale.items():
+                result = engine.update(ticker, rows, years, start_day)
+                if result is not None:
+                    records.append((ticker, years, int(rows[-1, 0]), now, json.dumps(result)))
+        engine.save()
+
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO metrics (ticker, years, last_bar, computed_at, payload)"
+                " VALUES (?, ?, ?, ?, ?)",
+                records
+            )
+            # Unchanged tickers are still current; bump them so they don't age out
+            unchanged = [t for t in bars if t not in stale]
+            conn.executemany("UPDATE metrics SET computed_at = ? WHERE ticker = ?", [(time.time(), t) for t in unchanged])
+    finally:
+        conn.close()
+
+    elapsed = time.time() - started
+    summary = {
+        "tickers": len(tickers),
+        "recomputed": len(stale),
+        "rows": len(records),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3)
+    }
+    print(f"Metrics table refresh: {summary}")
+    return summary
+
+
+def schedule_refresh():
+    """Refresh the table every trading day after market close"""
+    return schedule_daily("metrics_table", REFRESH_HOUR, REFRESH_MINUTE, refresh_metrics_table)
+
+
+if __name__ == "__main__":
+    refresh_metrics_table(sys.argv[1:] or None)
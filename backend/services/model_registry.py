@@ -0,0 +1,124 @@
+"""
+Process-wide registry for the LSTM price model
+
+The trained LSTM's weights (exported from Keras by lstm_model.py) are loaded
+once per process into a NumPy forward pass and warmed with a dummy inference,
+so serving doesn't import TensorFlow. If only the Keras model is present it
+is served through TensorFlow instead, so predictions don't silently drop to
+the fallback. The file's modification time is
+checked on each lookup (one stat call) and the model is reloaded only when
+it changes, so a retrained model is picked up without a restart. If the
+model can't be loaded, predictions use the moving-average fallback until
+the file changes again rather than retrying the load on every request.
+"""
+import os
+import hashlib
+import threading
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+
+# Written by `python lstm_model.py --export` (and after every training run)
+MODEL_PATH = os.environ.get("INVESTEZY_MODEL_PATH", os.path.join(MODEL_DIR, "stock_lstm_weights.npz"))
+
+# Served through TensorFlow only if the exported weights are missing
+KERAS_MODEL_PATH = os.environ.get("INVESTEZY_KERAS_MODEL_PATH", os.path.join(MODEL_DIR, "stock_lstm_model.keras"))
+
+# Input window the model was trained on (days of closes)
+SEQUENCE_LENGTH = 60
+
+
+class LoadedModel:
+    """
+    A loaded model with the version of the file it came from
+
+    `step` runs one forward pass on a (batch, SEQUENCE_LENGTH, 1) float32
+    array and returns (batch, 1) predictions.
+    """
+
+    def __init__(self, model, version, mtime, step=None):
+        self.model = model
+        self.version = version
+        self.mtime = mtime
+        self.step = step or model
+
+
+def _file_version(path):
+    """Short content hash, so the same file always reports the same version"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _load_keras(path, mtime):
+    from tensorflow import keras
+
+    model = keras.models.load_model(path)
+    return LoadedModel(model, _file_version(path), mtime, step=lambda windows: model(windows, training=False).numpy())
+
+
+def _load(path, mtime):
+    # Imported here so reporting model_stats() doesn't pull in NumPy
+    import numpy as np
+    from utils.lstm_numpy import NumpyLSTM
+
+    if path.endswith(".keras"):
+        loaded = _load_keras(path, mtime)
+    else:
+        loaded = LoadedModel(NumpyLSTM.load(path), _file_version(path), mtime)
+    # Fail here rather than on a user request if the weights don't fit the input
+    loaded.step(np.zeros((1, SEQUENCE_LENGTH, 1), dtype=np.float32))
+    return loaded
+
+
+_loaded = None
+_loaded_key = None
+_lock = threading.Lock()
+
+
+def _model_file():
+    """(path, mtime) of the file to serve: the exported weights, else the Keras model"""
+    for path in (MODEL_PATH, KERAS_MODEL_PATH):
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            continue
+    return None, None
+
+
+def get_model():
+    """The current model, reloaded when the file changes (None means use the fallback)"""
+    global _loaded, _loaded_key
+    key = _model_file()
+    if key == _loaded_key:
+        return _loaded
+
+    with _lock:
+        if key != _loaded_key:
+            path, mtime = key
+            if path is None:
+                print("LSTM model not found (run `python lstm_model.py --export`), using fallback model")
+                _loaded = None
+            else:
+                if path == KERAS_MODEL_PATH:
+                    print(f"{MODEL_PATH} not found, serving {path} through TensorFlow")
+                try:
+                    _loaded = _load(path, mtime)
+                    print(f"Loaded LSTM model {_loaded.version}")
+                except Exception as e:
+                    print(f"Could not load LSTM model, using fallback model: {str(e)}")
+                    _loaded = None
+            _loaded_key = key
+        return _loaded
+
+
+def model_stats():
+    """What is loaded, for the health endpoint"""
+    loaded = _loaded
+    path = _loaded_key[0] if _loaded_key else None
+    return {
+        "path": path or MODEL_PATH,
+        "loaded": loaded is not None,
+        "version": loaded.version if loaded else None
+    }
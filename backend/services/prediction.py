@@ -1,59 +1,33 @@
 import numpy as np
 import pandas as pd
-import tensorflow as tf
-from tensorflow import keras
-import yfinance as yf
-from sklearn.preprocessing import MinMaxScaler
+from services.fundamentals import get_company_name
+from services import price_store, price_panel, model_registry, prediction_cache
 from datetime import datetime, timedelta
 
-# Default model path - should be trained separately
-MODEL_PATH = "model/stock_lstm_model.keras"
+# Horizon always computed and cached, so shorter requests are a slice
+DEFAULT_HORIZON = 30
 
-def load_lstm_model():
-    """Load the pre-trained LSTM model"""
-    try:
-        return keras.models.load_model(MODEL_PATH)
-    except:
-        # Return a simple linear model as fallback if LSTM model is not available
-        print("LSTM model not found, using fallback model")
-        return None
+MAX_DAYS = prediction_cache.MAX_DAYS
+
+METHOD_NAMES = {"lstm": "LSTM Neural Network", "moving_average": "Moving Average Trend"}
 
 def predict_stock(ticker, days=30):
     """
     Predict stock prices for the next [days] using LSTM model
     or fallback to a simple moving average if model not available
+
+    Forecasts are cached per (ticker, last bar, model version, method), so
+    repeat calls are served without rerunning the model until a new bar
+    arrives or a new model is loaded.
     """
     try:
-        # Ensure proper ticker format for Indian stocks
-        if '.' not in ticker:
-            ticker = f"{ticker}.NS"
-            
-        # Get historical data
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="2y")
-        
-        if hist.empty or len(hist) < 100:
+        results, errors = predict_stocks([ticker], days)
+        if errors:
             return {
-                "error": f"Insufficient historical data for {ticker}",
+                "error": next(iter(errors.values())),
                 "success": False
             }
-        
-        # Get company name
-        company_name = stock.info.get('longName', ticker)
-        
-        # Current price and dates
-        current_price = hist['Close'].iloc[-1]
-        last_date = hist.index[-1]
-        
-        # Try to use LSTM model
-        model = load_lstm_model()
-        
-        if model:
-            # LSTM based prediction
-            return predict_with_lstm(model, hist, ticker, company_name, days, current_price, last_date)
-        else:
-            # Fallback to simple moving average
-            return predict_with_moving_average(hist, ticker, company_name, days, current_price, last_date)
+        return next(iter(results.values()))
     
     except Exception as e:
         print(f"Prediction error: {str(e)}")
@@ -62,73 +36,162 @@ def predict_stock(ticker, days=30):
             "success": False
         }
 
-def predict_with_lstm(model, hist, ticker, company_name, days, current_price, last_date):
-    """Generate predictions using LSTM model"""
-    # Prepare data
-    close_prices = hist['Close'].values.reshape(-1, 1)
-    scaler = MinMaxScaler(feature_range=(0, 1))
-    scaled_data = scaler.fit_transform(close_prices)
-    
-    # Create prediction sequence (last 60 days)
-    seq_length = 60
-    last_sequence = scaled_data[-seq_length:]
-    
-    # Generate predictions
-    future_prices = []
-    current_sequence = last_sequence.copy()
-    
-    for _ in range(days):
-        # Reshape for LSTM input [samples, time steps, features]
-        current_reshape = current_sequence.reshape((1, current_sequence.shape[0], 1))
-        next_pred = model.predict(current_reshape, verbose=0)[0][0]
-        future_prices.append(next_pred)
-        # Update sequence (remove oldest, add new prediction)
-        current_sequence = np.append(current_sequence[1:], [[next_pred]], axis=0)
-    
-    # Convert predictions back to original scale
-    future_prices = scaler.inverse_transform(np.array(future_prices).reshape(-1, 1))
-    future_prices = [float(p[0]) for p in future_prices]
-    
-    # Generate dates for predictions
-    prediction_dates = []
-    for i in range(1, days + 1):
-        prediction_dates.append((last_date + timedelta(days=i)).strftime('%Y-%m-%d'))
-    
-    # Calculate expected growth
-    expected_change = ((future_prices[-1] / current_price) - 1) * 100
-    trend = "up 📈" if expected_change > 0 else "down 📉"
-    
-    return {
-        "ticker": ticker,
-        "companyName": company_name,
-        "currentPrice": float(current_price),
-        "predictions": [
-            {"date": date, "price": round(price, 2)} 
-            for date, price in zip(prediction_dates, future_prices)
-        ],
-        "summary": {
-            "expectedChange": round(expected_change, 2),
-            "trend": trend,
-            "message": f"Our AI model predicts {company_name} will go {trend} by {abs(round(expected_change, 2))}% in the next {days} days."
-        },
-        "method": "LSTM Neural Network",
-        "success": True
-    }
+def _load_histories(tickers):
+    """
+    Two years of closes per ticker: views of the shared panel where it covers
+    them, the rest synced with the price store in batched downloads
+    """
+    histories, errors = {}, {}
+    panel = price_panel.get_price_panel()
+    missing = []
+    for ticker in tickers:
+        if panel is not None and panel.covers(ticker, 2):
+            histories[ticker] = panel.frame([ticker], 2, columns=["Close"])
+        else:
+            missing.append(ticker)
 
-def predict_with_moving_average(hist, ticker, company_name, days, current_price, last_date):
-    """Generate predictions using simple moving average as fallback"""
-    # Simple moving average
-    ma_window = min(30, len(hist) // 4)
-    daily_returns = hist['Close'].pct_change().dropna()
-    avg_daily_return = daily_returns[-ma_window:].mean()
-    
-    # Generate future prices
-    future_prices = []
-    next_price = current_price
+    if missing:
+        bars, errors = price_store.sync_many(missing)
+        for ticker, rows in bars.items():
+            histories[ticker] = price_store.rows_to_frame(price_store.slice_years(rows, 2))
+    return histories, errors
+
+def predict_stocks(tickers, days=30):
+    """
+    Predict prices for several tickers with one batched model pass
+
+    Histories are loaded in bulk, each series is scaled on its own range,
+    and every ticker not already in the prediction cache is forecast in the
+    same batched LSTM rollout (or moving-average pass).
+
+    Args:
+        tickers: List of stock symbols (with or without .NS suffix)
+        days: Number of days to forecast (1..MAX_DAYS)
+
+    Returns:
+        (results, errors) where results maps ticker -> prediction response,
+        in input order, and errors maps ticker -> message
+    """
+    # Ensure proper ticker format for Indian stocks
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {MAX_DAYS}")
+    symbols = [t.strip() for t in tickers if t and t.strip()]
+    ordered = list(dict.fromkeys(t if '.' in t else f"{t}.NS" for t in symbols))
+
+    histories, errors = _load_histories(ordered)
+    for ticker in ordered:
+        hist = histories.get(ticker)
+        if hist is None or hist.empty or len(hist) < 100:
+            histories.pop(ticker, None)
+            errors[ticker] = f"Insufficient historical data for {ticker}"
     
-    for _ in range(days):
-        next_price = next_price * (1 + avg_daily_return)
-        future_prices.append(next_price)
+    # Try to use LSTM model (loaded once per process by the registry);
+    # fall back to a simple moving average
+    loaded = model_registry.get_model()
+    method = "lstm" if loaded else "moving_average"
+    version = loaded.version if loaded else ""
+    last_bars = {ticker: _day_number(hist.index[-1]) for ticker, hist in histories.items()}
+
+    forecasts = prediction_cache.lookup_many(list(histories), last_bars, version, method, days)
+    pending = [ticker for ticker in histories if ticker not in forecasts]
+    if pending:
+        horizon = max(days, DEFAULT_HORIZON)
+        closes = [histories[ticker]['Close'].to_numpy() for ticker in pending]
+        if loaded:
+            predicted = forecast_lstm(loaded.step, closes, horizon)
+        else:
+            predicted = forecast_moving_average(closes, horizon)
+        fresh = {ticker: [float(p) for p in row] for ticker, row in zip(pending, predicted)}
+        prediction_cache.store_many(
+            {ticker: (last_bars[ticker], prices) for ticker, prices in fresh.items()}, version, method
+        )
+        forecasts.update(fresh)
+
+    results = {}
+    for ticker in ordered:
+        if ticker not in histories:
+            continue
+        hist = histories[ticker]
+        company_name = get_company_name(ticker, default=ticker)
+        current_price = float(hist['Close'].iloc[-1])
+        result = format_prediction(ticker, company_name, method, forecasts[ticker][:days], current_price, hist.index[-1])
+        if loaded:
+            result["modelVersion"] = version
+        results[ticker] = result
+    return results, errors
+
+def _day_number(date):
+    """Days since 1970-01-01, the key the price store and caches use for bars"""
+    return int(np.datetime64(date, "D").astype(np.int64))
+
+def rollout(step, windows, days):
+    """
+    Roll a one-step model forward `days` steps for many windows at once
+
+    Each prediction is written into a preallocated buffer right after its
+    window, so the next window is a slice of the buffer rather than a new
+    array, and every ticker advances in the same forward pass.
+
+    Args:
+        step: Callable mapping a (batch, seq_length, 1) array to (batch, 1)
+        windows: (batch, seq_length) array of scaled closes
+
+    Returns:
+        (batch, days) array of scaled predictions
+    """
+    batch, seq_length = windows.shape
+    buffer = np.empty((batch, seq_length + days, 1), dtype=np.float32)
+    buffer[:, :seq_length, 0] = windows
+    for i in range(days):
+        buffer[:, seq_length + i, 0] = step(buffer[:, i:i + seq_length])[:, 0]
+    return buffer[:, seq_length:, 0]
+
+def forecast_lstm(step, closes, days):
+    """
+    Forecast `days` closes for several tickers in one batched rollout
+
+    Each ticker's history is min-max scaled to [0, 1] on its own range, as
+    during training, and predictions are mapped back to prices.
+
+    Args:
+        step: The model's forward pass (see model_registry.LoadedModel.step)
+        closes: List of 1D arrays of close prices, one per ticker
+
+    Returns:
+        (tickers, days) array of predicted prices
+    """
+    seq_length = model_registry.SEQUENCE_LENGTH
+    lows = np.array([np.min(c) for c in closes], dtype=np.float64)
+    spans = np.array([np.max(c) for c in closes], dtype=np.float64) - lows
+    spans[spans == 0] = 1.0
+    windows = np.stack([np.asarray(c[-seq_length:], dtype=np.float64) for c in closes])
+    scaled = (windows - lows[:, None]) / spans[:, None]
+    predictions = rollout(step, scaled.astype(np.float32), days)
+    return predictions * spans[:, None] + lows[:, None]
+
+def forecast_moving_average(closes, days):
+    """
+    Extend each ticker's recent average daily return `days` steps ahead
+
+    Args:
+        closes: List of 1D arrays of close prices, one per ticker
+
+    Returns:
+        (tickers, days) array of predicted prices
+    """
+    steps = np.arange(1, days + 1)
+    forecasts = np.empty((len(closes), days))
+    for row, series in enumerate(closes):
+        series = np.asarray(series, dtype=np.float64)
+        ma_window = min(30, len(series) // 4)
+        daily_returns = series[1:] / series[:-1] - 1
+        avg_daily_return = daily_returns[-ma_window:].mean()
+        forecasts[row] = series[-1] * (1 + avg_daily_return) ** steps
+    return forecasts
+
+def format_prediction(ticker, company_name, method, future_prices, current_price, last_date):
+    """Build the API response for a forecast of len(future_prices) days"""
+    days = len(future_prices)
     
     # Generate dates for predictions
     prediction_dates = []
@@ -139,6 +202,11 @@ def predict_with_moving_average(hist, ticker, company_name, days, current_price,
     expected_change = ((future_prices[-1] / current_price) - 1) * 100
     trend = "up 📈" if expected_change > 0 else "down 📉"
     
+    if method == "lstm":
+        message = f"Our AI model predicts {company_name} will go {trend} by {abs(round(expected_change, 2))}% in the next {days} days."
+    else:
+        message = f"Based on recent trends, {company_name} may go {trend} by {abs(round(expected_change, 2))}% in the next {days} days."
+    
     return {
         "ticker": ticker,
         "companyName": company_name,
@@ -150,8 +218,8 @@ def predict_with_moving_average(hist, ticker, company_name, days, current_price,
         "summary": {
             "expectedChange": round(expected_change, 2),
             "trend": trend,
-            "message": f"Based on recent trends, {company_name} may go {trend} by {abs(round(expected_change, 2))}% in the next {days} days."
+            "message": message
         },
-        "method": "Moving Average Trend",
+        "method": METHOD_NAMES[method],
         "success": True
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,201 @@
+"""
+Persistent cache of price forecasts
+
+A forecast only changes when a new daily bar arrives or a different model is
+loaded, so each ticker keeps one row keyed by (last bar, model version,
+method) holding the longest horizon computed so far. Shorter requests are
+served by slicing it. Storing a forecast for a new bar or model replaces the
+ticker's old row, so stale entries never outlive the data they came from.
+
+After market close a job forecasts the longest supported horizon for the
+large caps (and the rest of the catalog) across CPU cores, so live
+inference only runs for long-tail tickers. Run it by hand with:
+    python -m services.prediction_cache [TICKER ...]
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from services.scheduler import schedule_daily
+
+PREDICTION_CACHE_PATH = os.environ.get("INVESTEZY_PREDICTION_CACHE", "store/predictions.db")
+
+# Longest forecast served (and precomputed nightly for the large caps)
+MAX_DAYS = 90
+
+# Processes used by the nightly precompute job
+PRECOMPUTE_WORKERS = int(os.environ.get("INVESTEZY_PRECOMPUTE_WORKERS", os.cpu_count() or 1))
+
+# Run the precompute job at 16:25 IST, after the price panel refresh
+REFRESH_HOUR, REFRESH_MINUTE = 16, 25
+
+
+def _connect():
+    os.makedirs(os.path.dirname(PREDICTION_CACHE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(PREDICTION_CACHE_PATH, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS predictions ("
+        " ticker TEXT PRIMARY KEY,"
+        " last_bar INTEGER NOT NULL,"
+        " model_version TEXT NOT NULL,"
+        " method TEXT NOT NULL,"
+        " days INTEGER NOT NULL,"
+        " computed_at REAL NOT NULL,"
+        " prices TEXT NOT NULL"
+        ") WITHOUT ROWID"
+    )
+    return conn
+
+
+def lookup_many(tickers, last_bars, model_version, method, days):
+    """
+    Cached forecasts for several tickers
+
+    Args:
+        tickers: Tickers to look up
+        last_bars: Dictionary of ticker -> day number of its latest bar
+
+    Returns:
+        Dictionary of ticker -> list of at least `days` predicted prices,
+        for tickers whose row matches the current bar, model and method
+    """
+    if not tickers or not os.path.exists(PREDICTION_CACHE_PATH):
+        return {}
+    try:
+        conn = _connect()
+        try:
+            placeholders = ",".join("?" * len(tickers))
+            rows = conn.execute(
+                f"SELECT ticker, last_bar, prices FROM predictions"
+                f" WHERE model_version = ? AND method = ? AND days >= ? AND ticker IN ({placeholders})",
+                [model_version, method, days, *tickers]
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Prediction cache read failed: {str(e)}")
+        return {}
+    return {
+        ticker: json.loads(prices) for ticker, last_bar, prices in rows
+        if last_bars.get(ticker) == last_bar
+    }
+
+
+def lookup(ticker, last_bar, model_version, method, days):
+    """Cached forecast of at least `days` prices for one ticker, or None"""
+    return lookup_many([ticker], {ticker: last_bar}, model_version, method, days).get(ticker)
+
+
+def store_many(forecasts, model_version, method):
+    """
+    Save forecasts, replacing each ticker's previous row
+
+    Args:
+        forecasts: Dictionary of ticker -> (last bar day number, list of prices)
+    """
+    if not forecasts:
+        return
+    now = time.time()
+    records = [
+        (ticker, last_bar, model_version, method, len(prices), now, json.dumps(prices))
+        for ticker, (last_bar, prices) in forecasts.items()
+    ]
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO predictions"
+                    " (ticker, last_bar, model_version, method, days, computed_at, prices)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    records
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Prediction cache write failed: {str(e)}")
+
+
+def store(ticker, last_bar, model_version, method, prices):
+    """Save one ticker's forecast"""
+    store_many({ticker: (last_bar, prices)}, model_version, method)
+
+
+def _forecast_chunk(tickers, days):
+    from services import prediction
+    results, errors = prediction.predict_stocks(tickers, days)
+    return len(results), errors
+
+
+def precompute_universe():
+    """Large caps first, then the rest of the catalog"""
+    from services.catalog import get_catalog
+    catalog = get_catalog()
+    return list(dict.fromkeys([*catalog.large_caps, *catalog.stocks]))
+
+
+def precompute_forecasts(tickers=None):
+    """
+    Forecast the longest supported horizon for a universe of tickers
+
+    Bars are synced once up front; the tickers are then split into one
+    chunk per worker process and each chunk is forecast with one batched
+    model pass. Tickers already cached for their latest bar are skipped.
+    A chunk that fails is logged and its tickers counted as errors; the
+    other chunks' forecasts are still stored.
+
+    Args:
+        tickers: Tickers to forecast (default: precompute_universe())
+
+    Returns:
+        Dictionary with counts, wall time and throughput
+    """
+    from services import price_store
+
+    started = time.time()
+    tickers = list(tickers) if tickers else precompute_universe()
+    _, errors = price_store.sync_many(tickers, force=True)
+
+    workers = max(1, min(PRECOMPUTE_WORKERS, len(tickers)))
+    chunks = [tickers[i::workers] for i in range(workers)]
+    forecast, failed_chunks = 0, 0
+    # Spawned rather than forked: the job runs on a scheduler thread
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {pool.submit(_forecast_chunk, chunk, MAX_DAYS): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                count, chunk_errors = future.result()
+            except Exception as e:
+                print(f"Forecast precompute chunk of {len(futures[future])} tickers failed: {str(e)}")
+                failed_chunks += 1
+                errors.update({ticker: str(e) for ticker in futures[future]})
+                continue
+            forecast += count
+            errors.update(chunk_errors)
+
+    elapsed = time.time() - started
+    summary = {
+        "tickers": len(tickers),
+        "forecast": forecast,
+        "errors": len(errors),
+        "failedChunks": failed_chunks,
+        "workers": workers,
+        "seconds": round(elapsed, 3),
+        "tickersPerSecond": round(forecast / elapsed, 2) if elapsed > 0 else None,
+        "msPerTicker": round(1000 * elapsed / forecast, 1) if forecast else None
+    }
+    print(f"Forecast precompute: {summary}")
+    return summary
+
+
+def schedule_refresh():
+    """Precompute forecasts every trading day after market close"""
+    return schedule_daily("prediction_cache", REFRESH_HOUR, REFRESH_MINUTE, precompute_forecasts)
+
+
+if __name__ == "__main__":
+    precompute_forecasts(sys.argv[1:] or None)
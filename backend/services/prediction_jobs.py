@@ -0,0 +1,360 @@
+"""
+Prediction job queue shared by every API worker process
+
+Forecasts are CPU-bound, so running them on Flask request threads lets a
+burst of predictions starve cheap endpoints. Jobs are recorded in the
+prediction cache's SQLite database instead, so any worker can submit a job
+and any worker can answer a poll for it. Identical in-flight jobs share one
+job id, and submissions are refused with QueueFull once MAX_PENDING jobs
+are waiting or running so callers can answer 429.
+
+Exactly one process runs the jobs: whichever holds an exclusive lock on
+`<cache db>.dispatch.lock` owns the pool of WORKERS forecast processes
+(each loads the model once) and claims queued jobs as workers free up.
+Every process that submits starts a dispatcher thread that waits for the
+lock, so if the owner exits another process takes over and requeues the
+jobs that were running there.
+
+Finished jobs are kept for RESULT_TTL seconds so their result can be polled.
+"""
+import os
+import json
+import time
+import uuid
+import fcntl
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from services import prediction_cache
+from services.prediction_cache import MAX_DAYS
+
+# Worker processes running forecasts, across all API workers
+WORKERS = int(os.environ.get("INVESTEZY_PREDICT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+# Jobs waiting or running before new submissions are refused
+MAX_PENDING = int(os.environ.get("INVESTEZY_PREDICT_QUEUE", 32))
+
+# Seconds a finished job's result stays available
+RESULT_TTL = int(os.environ.get("INVESTEZY_PREDICT_RESULT_TTL", 10 * 60))
+
+# Most tickers one batch job may forecast
+MAX_BATCH_TICKERS = int(os.environ.get("INVESTEZY_PREDICT_MAX_TICKERS", 50))
+
+# Seconds between checks of the job table while waiting for a job or for work
+POLL_INTERVAL = 0.05
+
+# Job states; queued and running jobs count as in flight
+IN_FLIGHT = ("queued", "running")
+
+
+class QueueFull(Exception):
+    """Raised when MAX_PENDING jobs are already in flight"""
+
+
+def _init_worker():
+    # Import the forecasting stack and load the model once per worker
+    import services.prediction
+    from services import model_registry
+    model_registry.get_model()
+
+
+def _run(ticker, days):
+    from services import prediction
+    return prediction.predict_stock(ticker, days)
+
+
+def _run_batch(tickers, days):
+    from services import prediction
+    results, errors = prediction.predict_stocks(tickers, days)
+    return {
+        "forecasts": list(results.values()),
+        "errors": errors,
+        "count": len(results),
+        "success": True
+    }
+
+
+# Job kinds a dispatcher can run: name -> (function, params -> arguments)
+_TASKS = {
+    "ticker": (_run, lambda params: (params["ticker"], params["days"])),
+    "batch": (_run_batch, lambda params: (params["tickers"], params["days"]))
+}
+
+
+def _connect():
+    path = prediction_cache.PREDICTION_CACHE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS prediction_jobs ("
+        " id TEXT PRIMARY KEY,"
+        " key TEXT NOT NULL,"
+        " kind TEXT NOT NULL,"
+        " params TEXT NOT NULL,"
+        " status TEXT NOT NULL,"
+        " result TEXT,"
+        " error TEXT,"
+        " submitted_at REAL NOT NULL,"
+        " finished_at REAL"
+        ") WITHOUT ROWID"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS prediction_jobs_status ON prediction_jobs (status, submitted_at)")
+    return conn
+
+
+class Job:
+    """A snapshot of one row of the job table"""
+
+    def __init__(self, job_id, params, status, result=None, error=None):
+        self.id = job_id
+        self.params = params
+        self.status = status
+        self.result = result
+        self.error = error
+
+    @classmethod
+    def _from_row(cls, row):
+        job_id, params, status, result, error = row
+        return cls(job_id, json.loads(params), status, json.loads(result) if result else None, error)
+
+    def wait(self, timeout):
+        """Block up to timeout seconds for the job to finish; True if it did"""
+        deadline = time.monotonic() + timeout
+        while self.status in IN_FLIGHT:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+            latest = get_job(self.id)
+            if latest is None:
+                return False
+            self.status, self.result, self.error = latest.status, latest.result, latest.error
+        return True
+
+    def to_dict(self):
+        response = {"jobId": self.id, **self.params, "status": self.status}
+        if self.status == "done":
+            response["result"] = self.result
+        elif self.status == "failed":
+            response["error"] = f"Prediction failed: {self.error}"
+        return response
+
+
+_SELECT = "SELECT id, params, status, result, error FROM prediction_jobs"
+
+
+def _submit(kind, key, params):
+    _ensure_dispatcher()
+    key = json.dumps(key)
+    conn = _connect()
+    try:
+        # IMMEDIATE takes the write lock up front, so dedup and the limit hold across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM prediction_jobs WHERE finished_at < ?", (time.time() - RESULT_TTL,))
+            row = conn.execute(
+                f"{_SELECT} WHERE key = ? AND status IN (?, ?)", (key, *IN_FLIGHT)
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return Job._from_row(row)
+            in_flight = conn.execute(
+                "SELECT COUNT(*) FROM prediction_jobs WHERE status IN (?, ?)", IN_FLIGHT
+            ).fetchone()[0]
+            if in_flight >= MAX_PENDING:
+                raise QueueFull(f"{in_flight} predictions already queued")
+            job = Job(uuid.uuid4().hex, params, "queued")
+            conn.execute(
+                "INSERT INTO prediction_jobs (id, key, kind, params, status, submitted_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, key, kind, json.dumps(params), job.status, time.time())
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    _wakeup.set()
+    return job
+
+
+def _normalize(ticker, days):
+    ticker = ticker.strip()
+    # Same normalization as predict_stock, so "TCS" and "TCS.NS" share a job
+    if '.' not in ticker:
+        ticker = f"{ticker}.NS"
+    # Horizons beyond MAX_DAYS produce the same forecast, so they share a job
+    return ticker, max(1, min(days, MAX_DAYS))
+
+
+def submit(ticker, days):
+    """
+    Queue a forecast, or return the identical job already in flight
+
+    Raises:
+        QueueFull: if MAX_PENDING jobs are already waiting or running
+    """
+    ticker, days = _normalize(ticker, days)
+    return _submit("ticker", ["ticker", ticker, days], {"ticker": ticker, "days": days})
+
+
+def submit_batch(tickers, days):
+    """
+    Queue one batched forecast for several tickers (see predict_stocks)
+
+    Raises:
+        ValueError: if there are more than MAX_BATCH_TICKERS distinct tickers
+        QueueFull: if MAX_PENDING jobs are already waiting or running
+    """
+    ordered = list(dict.fromkeys(_normalize(t, days)[0] for t in tickers if t and t.strip()))
+    if len(ordered) > MAX_BATCH_TICKERS:
+        raise ValueError(f"At most {MAX_BATCH_TICKERS} tickers per forecast")
+    days = max(1, min(days, MAX_DAYS))
+    return _submit("batch", ["batch", ordered, days], {"tickers": ordered, "days": days})
+
+
+def get_job(job_id):
+    """A submitted job by id (from any worker process), or None if unknown or expired"""
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                f"{_SELECT} WHERE id = ? AND (finished_at IS NULL OR finished_at >= ?)",
+                (job_id, time.time() - RESULT_TTL)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Prediction job read failed: {str(e)}")
+        return None
+    return Job._from_row(row) if row else None
+
+
+def queue_stats():
+    """Pool size and queue depth, for the health endpoint"""
+    try:
+        conn = _connect()
+        try:
+            counts = dict(conn.execute(
+                "SELECT status, COUNT(*) FROM prediction_jobs WHERE finished_at IS NULL OR finished_at >= ?"
+                " GROUP BY status", (time.time() - RESULT_TTL,)
+            ).fetchall())
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Prediction job read failed: {str(e)}")
+        counts = {}
+    return {
+        "workers": WORKERS,
+        "inFlight": sum(counts.get(status, 0) for status in IN_FLIGHT),
+        "maxPending": MAX_PENDING,
+        "jobs": sum(counts.values()),
+        "dispatcher": _is_dispatcher
+    }
+
+
+# Dispatcher: one per process, but only the lock holder runs jobs
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+_wakeup = threading.Event()
+_is_dispatcher = False
+
+
+def _ensure_dispatcher():
+    """Start this process's dispatcher thread (idempotent)"""
+    global _dispatcher
+    if _dispatcher is not None:
+        return
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = threading.Thread(target=_dispatch_loop, name="prediction-dispatcher", daemon=True)
+            _dispatcher.start()
+
+
+def _record(job_id, status, result=None, error=None):
+    try:
+        conn = _connect()
+        try:
+            conn.execute(
+                "UPDATE prediction_jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        print(f"Could not record prediction job {job_id}: {str(e)}")
+    _wakeup.set()
+
+
+def _finish(job_id, future):
+    try:
+        result = json.dumps(future.result())
+    except Exception as e:
+        _record(job_id, "failed", error=str(e))
+    else:
+        _record(job_id, "done", result=result)
+
+
+def _claim(conn, limit):
+    """Mark up to `limit` of the oldest queued jobs as running and return them"""
+    # Only the dispatcher moves jobs out of the queue, so no other claimer can race us
+    rows = conn.execute(
+        "SELECT id, kind, params FROM prediction_jobs WHERE status = 'queued'"
+        " ORDER BY submitted_at LIMIT ?", (limit,)
+    ).fetchall()
+    if rows:
+        conn.executemany("UPDATE prediction_jobs SET status = 'running' WHERE id = ?", [(r[0],) for r in rows])
+    return rows
+
+
+def _new_pool():
+    # Spawned rather than forked: forking a threaded server can copy held locks
+    return ProcessPoolExecutor(
+        max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+    )
+
+
+def _dispatch_loop():
+    global _is_dispatcher
+    lock_path = f"{prediction_cache.PREDICTION_CACHE_PATH}.dispatch.lock"
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    lock = open(lock_path, "w")
+    # Blocks until no other process is dispatching; released by the OS if we exit
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    _is_dispatcher = True
+
+    conn = _connect()
+    # Jobs left running by a previous dispatcher that exited
+    conn.execute("UPDATE prediction_jobs SET status = 'queued' WHERE status = 'running'")
+
+    pool = _new_pool()
+    active = set()
+    while True:
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+        active = {future for future in active if not future.done()}
+        if len(active) >= WORKERS:
+            continue
+        try:
+            claimed = _claim(conn, WORKERS - len(active))
+        except sqlite3.Error as e:
+            print(f"Prediction dispatcher error: {str(e)}")
+            continue
+        for job_id, kind, params in claimed:
+            fn, arguments = _TASKS[kind]
+            try:
+                try:
+                    future = pool.submit(fn, *arguments(json.loads(params)))
+                except BrokenProcessPool:
+                    # A worker died (e.g. killed for memory); start a fresh pool
+                    pool = _new_pool()
+                    future = pool.submit(fn, *arguments(json.loads(params)))
+            except Exception as e:
+                _record(job_id, "failed", error=str(e))
+                continue
+            active.add(future)
+            future.add_done_callback(lambda f, job_id=job_id: _finish(job_id, f))
@@ -0,0 +1,198 @@
+"""
+Aligned close-price panel shared by every worker
+
+All stored tickers' daily closes are laid out as one float64 (dates x tickers)
+matrix on the union of their trading days, NaN where a ticker has no bar. The
+matrix is written column-major, so each ticker's history is contiguous, and
+every worker memory-maps the same file read-only: a single-ticker slice is a
+view into the page cache rather than a per-process DataFrame copy. Closes
+keep the price store's float64 values, so a panel slice is identical to the
+same history read from the store.
+
+Rebuild by hand with:
+    python -m services.price_panel [TICKER ...]
+"""
+import os
+import sys
+import glob
+import json
+import fcntl
+import time
+import threading
+import numpy as np
+import pandas as pd
+from services import price_store
+from services.scheduler import schedule_daily
+
+PANEL_PATH = os.environ.get("INVESTEZY_PRICE_PANEL", "store/price_panel.json")
+
+# Calendar years of history kept (the longest metrics horizon plus one)
+PANEL_YEARS = int(os.environ.get("INVESTEZY_PANEL_YEARS", 11))
+
+# Panels older than this are ignored, in case the job stopped running
+MAX_AGE = int(os.environ.get("INVESTEZY_PANEL_MAX_AGE", 3 * 24 * 60 * 60))
+
+# After the metrics job has synced the day's final bars (16:15 IST)
+REFRESH_HOUR, REFRESH_MINUTE = 16, 20
+
+
+class PricePanel:
+    """Read-only, memory-mapped close prices with ticker and date indexes"""
+
+    def __init__(self, tickers, days, closes, meta=None):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.days = np.asarray(days, dtype=np.int64)
+        self.dates = pd.DatetimeIndex(self.days.astype("datetime64[D]"), name="Date")
+        self.closes = closes
+        self.meta = meta or {}
+
+    def __contains__(self, ticker):
+        return ticker in self.index
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def covers(self, ticker, years):
+        """True if the panel holds the ticker's full history over the last `years` years"""
+        return ticker in self.index and years <= self.meta.get("years", PANEL_YEARS)
+
+    def start_row(self, years):
+        """First row inside a window covering the last `years` years"""
+        return int(np.searchsorted(self.days, price_store.window_start_day(years)))
+
+    def column(self, ticker, years=None):
+        """One ticker's closes (a view into the mapped file, NaN where it has no bar)"""
+        start = 0 if years is None else self.start_row(years)
+        return self.closes[start:, self.index[ticker]]
+
+    def frame(self, tickers, years, columns=None):
+        """
+        Closes for tickers over the last `years` years as a DataFrame
+
+        Rows where none of the tickers traded are dropped, matching an outer
+        join of their own histories. A single ticker without gaps is served
+        as a view of the mapped file; selecting several tickers copies only
+        the requested window.
+        """
+        start = self.start_row(years)
+        cols = [self.index[t] for t in tickers]
+        if len(cols) == 1:
+            values = self.closes[start:, cols[0]:cols[0] + 1]
+        else:
+            values = self.closes[start:, cols]
+        dates = self.dates[start:]
+
+        traded = ~np.isnan(values).all(axis=1)
+        if len(traded) and not traded[0]:
+            # Leading rows before listing: slicing keeps the view
+            first = int(np.argmax(traded)) if traded.any() else len(traded)
+            values, dates, traded = values[first:], dates[first:], traded[first:]
+        if not traded.all():
+            values, dates = values[traded], dates[traded]
+        return pd.DataFrame(values, index=dates, columns=columns or list(tickers), copy=False)
+
+    @classmethod
+    def load(cls, path=PANEL_PATH):
+        with open(path) as f:
+            meta = json.load(f)
+        directory = os.path.dirname(path)
+        days = np.load(os.path.join(directory, meta["days"]))
+        closes = np.load(os.path.join(directory, meta["closes"]), mmap_mode="r")
+        return cls(meta["tickers"], days, closes, meta)
+
+
+def build_panel(tickers=None, years=PANEL_YEARS, path=PANEL_PATH):
+    """
+    Lay out stored closes as one aligned panel and publish it atomically
+
+    Reads the price store only (the metrics job has already synced the day's
+    bars). Arrays go to new versioned .npy files; the JSON manifest pointing
+    at them is replaced last, so workers never map a half-written panel.
+    """
+    started = time.time()
+    tickers = list(dict.fromkeys(tickers or price_store.stored_tickers()))
+    since = price_store.window_start_day(years)
+
+    columns = {}
+    for ticker in tickers:
+        rows = price_store.load_bars(ticker)
+        if rows is None or len(rows) == 0:
+            continue
+        rows = rows[np.searchsorted(rows[:, 0], since):]
+        if len(rows):
+            columns[ticker] = (rows[:, 0].astype(np.int64), rows[:, 4])
+
+    kept = list(columns)
+    days = np.unique(np.concatenate([d for d, _ in columns.values()])) if columns else np.empty(0, dtype=np.int64)
+    closes = np.full((len(days), len(kept)), np.nan, dtype=np.float64, order="F")
+    for j, ticker in enumerate(kept):
+        ticker_days, ticker_closes = columns[ticker]
+        closes[np.searchsorted(days, ticker_days), j] = ticker_closes
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    built_at = int(time.time())
+    # Unique per build, so overlapping builds never truncate files workers have mapped
+    version = f"{time.time_ns()}-{os.getpid()}"
+    days_name, closes_name = f"{stem}.{version}.days.npy", f"{stem}.{version}.closes.npy"
+
+    meta = {
+        "tickers": kept,
+        "days": days_name,
+        "closes": closes_name,
+        "years": int(years),
+        "builtAt": built_at
+    }
+    # One build publishes at a time, so cleanup can't remove another build's unpublished files
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        np.save(os.path.join(directory, days_name), days)
+        np.save(os.path.join(directory, closes_name), closes)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+        # Old files stay mapped in running workers until they reload
+        for old in glob.glob(os.path.join(directory, f"{stem}.*.npy")):
+            if os.path.basename(old) not in (days_name, closes_name):
+                os.remove(old)
+
+    print(f"Price panel: {len(kept)} of {len(tickers)} tickers, {len(days)} days "
+          f"in {time.time() - started:.2f}s")
+    return PricePanel(kept, days, closes, meta)
+
+
+_cached = None
+_cached_mtime = None
+_cache_lock = threading.Lock()
+
+
+def get_price_panel():
+    """The published panel, reloaded when a new one is built (None if missing or stale)"""
+    global _cached, _cached_mtime
+    try:
+        mtime = os.path.getmtime(PANEL_PATH)
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached is None or mtime != _cached_mtime:
+            try:
+                _cached = PricePanel.load(PANEL_PATH)
+                _cached_mtime = mtime
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load price panel: {str(e)}")
+        if _cached is None or time.time() - _cached.meta.get("builtAt", 0) > MAX_AGE:
+            return None
+        return _cached
+
+
+def schedule_refresh():
+    """Rebuild the panel every trading day after market close"""
+    return schedule_daily("price_panel", REFRESH_HOUR, REFRESH_MINUTE, build_panel)
+
+
+if __name__ == "__main__":
+    build_panel(sys.argv[1:] or None)
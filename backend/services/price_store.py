@@ -0,0 +1,293 @@
+import os
+import time
+import threading
+import numpy as np
+import pandas as pd
+from services.market_data import get_provider
+
+# One .npy file of daily bars per ticker, memory-mapped on read
+PRICE_STORE_DIR = os.environ.get("INVESTEZY_PRICE_STORE", "store/prices")
+
+# Seconds a stored ticker is trusted before asking upstream for new bars
+REFRESH_INTERVAL = int(os.environ.get("INVESTEZY_PRICE_REFRESH", 6 * 60 * 60))
+
+# Max tickers per batched upstream download
+BATCH_SIZE = int(os.environ.get("INVESTEZY_PRICE_BATCH", 50))
+
+# Relative close difference on a re-downloaded bar that means upstream has
+# re-adjusted history (split or dividend) and the ticker must be refetched
+ADJUSTMENT_TOLERANCE = 1e-3
+
+# Row layout: day number (days since 1970-01-01) followed by OHLCV
+COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _ticker_lock(ticker):
+    """One lock per ticker so concurrent requests don't write the same file twice"""
+    with _locks_guard:
+        if ticker not in _locks:
+            _locks[ticker] = threading.Lock()
+        return _locks[ticker]
+
+
+def _path(ticker):
+    safe_name = ticker.replace(os.sep, "_")
+    return os.path.join(PRICE_STORE_DIR, f"{safe_name}.npy")
+
+
+def stored_tickers():
+    """Every ticker that has history in the store"""
+    try:
+        names = os.listdir(PRICE_STORE_DIR)
+    except OSError:
+        return []
+    return sorted(name[:-len(".npy")] for name in names if name.endswith(".npy"))
+
+
+def load_bars(ticker):
+    """Return the stored bars for a ticker as a read-only memory map, or None"""
+    path = _path(ticker)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path, mmap_mode="r")
+    except (ValueError, OSError):
+        return None
+
+
+def save_bars(ticker, rows):
+    """Atomically replace the stored bars for a ticker"""
+    os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+    path = _path(ticker)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.ascontiguousarray(rows, dtype=np.float64))
+    os.replace(tmp_path, path)
+
+
+def frame_to_rows(hist):
+    """Convert a yfinance history DataFrame to the stored row layout"""
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    days = index.values.astype("datetime64[D]").astype(np.int64)
+
+    rows = np.empty((len(hist), len(COLUMNS) + 1), dtype=np.float64)
+    rows[:, 0] = days
+    for i, column in enumerate(COLUMNS, start=1):
+        rows[:, i] = hist[column].values if column in hist else np.nan
+    return rows
+
+
+def rows_to_frame(rows):
+    """Convert stored rows back to a DataFrame indexed by date"""
+    index = pd.DatetimeIndex(rows[:, 0].astype("int64").astype("datetime64[D]"), name="Date")
+    return pd.DataFrame(np.array(rows[:, 1:]), index=index, columns=COLUMNS)
+
+
+def merge_rows(stored, fresh):
+    """
+    Merge freshly fetched rows into the stored ones
+
+    Fresh rows win on overlapping dates so a partial intraday bar stored
+    earlier is replaced by the final one.
+    """
+    if stored is None or len(stored) == 0:
+        return fresh
+    if len(fresh) == 0:
+        return np.array(stored)
+    keep = stored[:, 0] < fresh[0, 0]
+    return np.concatenate([stored[keep], fresh])
+
+
+def is_fresh(ticker):
+    """True if the ticker was synced with upstream within REFRESH_INTERVAL"""
+    try:
+        return time.time() - os.path.getmtime(_path(ticker)) < REFRESH_INTERVAL
+    except OSError:
+        return False
+
+
+def _check_day(stored):
+    """
+    Day the delta download starts at: the last complete stored bar
+
+    Bars are adjusted for splits and dividends, so re-downloading one bar we
+    already have shows whether upstream has rescaled history since. The
+    last stored bar may be a partial intraday one, so the bar before it is
+    the one compared.
+    """
+    return int(stored[-2, 0]) if len(stored) > 1 else int(stored[-1, 0])
+
+
+def is_readjusted(stored, fresh):
+    """True if the check bar's close in `fresh` differs from the stored one"""
+    day = _check_day(stored)
+    i = np.searchsorted(fresh[:, 0], day)
+    if i == len(fresh) or fresh[i, 0] != day:
+        return False
+    old_close, new_close = stored[np.searchsorted(stored[:, 0], day), 4], fresh[i, 4]
+    if np.isnan(old_close) or np.isnan(new_close) or old_close == 0:
+        return False
+    return abs(new_close / old_close - 1) > ADJUSTMENT_TOLERANCE
+
+
+def _fetch(ticker, stored):
+    """Fetch full history for a new ticker, or only the bars since the last complete stored bar"""
+    provider = get_provider()
+    if stored is None or len(stored) == 0:
+        return provider.history(ticker, period="max")
+    # Overlap the stored tail so a partial bar gets rewritten and re-adjustments show up
+    return provider.history(ticker, start=str(np.datetime64(_check_day(stored), "D")))
+
+
+def sync(ticker):
+    """
+    Bring the stored history for a ticker up to date with upstream
+
+    Returns the stored bars after syncing. If upstream fails but older bars
+    are stored, those are returned instead of raising.
+    """
+    with _ticker_lock(ticker):
+        stored = load_bars(ticker)
+        if stored is not None and is_fresh(ticker):
+            return stored
+
+        try:
+            hist = _fetch(ticker, stored)
+        except Exception:
+            if stored is not None and len(stored) > 0:
+                return stored
+            raise
+
+        if hist is None or hist.empty:
+            if stored is not None:
+                os.utime(_path(ticker))  # Nothing new, but we checked
+            return stored
+
+        fresh = frame_to_rows(hist)
+        if stored is not None and len(stored) > 0 and is_readjusted(stored, fresh):
+            # A split or dividend rescaled upstream history; replace ours
+            try:
+                full = get_provider().history(ticker, period="max")
+            except Exception:
+                return stored
+            if full is None or full.empty:
+                return stored
+            save_bars(ticker, frame_to_rows(full))
+        else:
+            save_bars(ticker, merge_rows(stored, fresh))
+        return load_bars(ticker)
+
+
+def sync_many(tickers, force=False):
+    """
+    Sync several tickers with upstream using batched downloads
+
+    New tickers are fetched with full history and stored tickers with delta
+    downloads, batched among tickers whose last complete stored bar is on
+    the same day. Tickers whose history upstream has re-adjusted since (splits,
+    dividends) are then refetched in full.
+    With force=True recently synced tickers are fetched again too (used
+    after market close to replace partial intraday bars).
+
+    Returns:
+        (bars, errors) where bars maps ticker -> stored rows and errors maps
+        ticker -> message for tickers that could not be loaded
+    """
+    bars, errors = {}, {}
+    new, stale = [], {}
+    for ticker in tickers:
+        stored = load_bars(ticker)
+        if stored is not None and len(stored) > 0 and not force and is_fresh(ticker):
+            bars[ticker] = stored
+        elif stored is None or len(stored) == 0:
+            new.append(ticker)
+        else:
+            stale[ticker] = stored
+
+    def fetch_batches(batch_tickers, **kwargs):
+        for i in range(0, len(batch_tickers), BATCH_SIZE):
+            chunk = batch_tickers[i:i + BATCH_SIZE]
+            try:
+                frames = get_provider().download(chunk, **kwargs)
+            except Exception as e:
+                frames = {}
+                for ticker in chunk:
+                    errors[ticker] = str(e)
+            for ticker in chunk:
+                yield ticker, frames.get(ticker)
+
+    # Group stale tickers by check day so one long-stale ticker doesn't widen
+    # every batch's download to its whole gap
+    by_start = {}
+    for ticker, rows in stale.items():
+        by_start.setdefault(_check_day(rows), []).append(ticker)
+    fetches = list(fetch_batches(new, period="max"))
+    for start_day, group in sorted(by_start.items()):
+        fetches += list(fetch_batches(group, start=str(np.datetime64(start_day, "D"))))
+
+    readjusted = []
+    for ticker, hist in fetches:
+        with _ticker_lock(ticker):
+            stored = stale.get(ticker)
+            if hist is not None and not hist.empty:
+                fresh = frame_to_rows(hist)
+                if stored is not None and is_readjusted(stored, fresh):
+                    readjusted.append(ticker)
+                    continue
+                save_bars(ticker, merge_rows(stored, fresh))
+                bars[ticker] = load_bars(ticker)
+                errors.pop(ticker, None)
+            elif stored is not None:
+                # Serve what we have; only mark as checked if upstream answered
+                if ticker not in errors:
+                    os.utime(_path(ticker))
+                errors.pop(ticker, None)
+                bars[ticker] = stored
+            else:
+                errors.setdefault(ticker, f"No data available for {ticker}")
+
+    # A split or dividend rescaled upstream history; replace ours in full
+    for ticker, hist in fetch_batches(readjusted, period="max"):
+        with _ticker_lock(ticker):
+            if hist is not None and not hist.empty:
+                save_bars(ticker, frame_to_rows(hist))
+                bars[ticker] = load_bars(ticker)
+            else:
+                # Serve the old scale until the next sync retries
+                bars[ticker] = stale[ticker]
+            errors.pop(ticker, None)
+    return bars, errors
+
+
+def window_start_day(years):
+    """Day number of the first day in a window covering the last `years` years"""
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(years=years)
+    return int(start.to_datetime64().astype("datetime64[D]").astype(np.int64))
+
+
+def slice_years(rows, years):
+    """Slice stored rows to the last `years` years of calendar time"""
+    if rows is None or len(rows) == 0:
+        return rows
+    return rows[np.searchsorted(rows[:, 0], window_start_day(years)):]
+
+
+def get_history(ticker, years):
+    """
+    Get daily bars covering the last `years` years for a ticker
+
+    Only bars newer than the last stored date are downloaded; everything
+    else is served from the local store.
+
+    Returns:
+        DataFrame with Open/High/Low/Close/Volume columns (empty if no data)
+    """
+    rows = slice_years(sync(ticker), years)
+    if rows is None:
+        return pd.DataFrame(columns=COLUMNS)
+    return rows_to_frame(rows)
@@ -0,0 +1,60 @@
+import os
+import time
+import threading
+import traceback
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+# Market hours are in IST; NSE closes at 15:30
+MARKET_TZ = ZoneInfo("Asia/Kolkata")
+
+# Only one process should run scheduled jobs (e.g. not every gunicorn worker)
+JOBS_ENABLED = os.environ.get("INVESTEZY_RUN_JOBS", "0") == "1"
+
+_jobs = {}
+_lock = threading.Lock()
+
+
+def next_run_time(hour, minute, now=None, weekdays_only=True):
+    """Next datetime (in market time) at hour:minute, skipping weekends if asked"""
+    now = now or datetime.now(MARKET_TZ)
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    while weekdays_only and run_at.weekday() >= 5:
+        run_at += timedelta(days=1)
+    return run_at
+
+
+def _run_daily(name, hour, minute, fn, weekdays_only):
+    while True:
+        run_at = next_run_time(hour, minute, weekdays_only=weekdays_only)
+        time.sleep(max(0, (run_at - datetime.now(MARKET_TZ)).total_seconds()))
+        started = time.time()
+        try:
+            fn()
+            print(f"Job {name} finished in {time.time() - started:.2f}s")
+        except Exception as e:
+            print(f"Job {name} failed: {str(e)}")
+            traceback.print_exc()
+
+
+def schedule_daily(name, hour, minute, fn, weekdays_only=True):
+    """
+    Run fn() every trading day at hour:minute IST on a daemon thread
+
+    Does nothing unless INVESTEZY_RUN_JOBS=1, so that only the designated
+    process runs jobs. Scheduling the same name twice is a no-op.
+    """
+    if not JOBS_ENABLED:
+        return False
+    with _lock:
+        if name in _jobs:
+            return False
+        thread = threading.Thread(
+            target=_run_daily, args=(name, hour, minute, fn, weekdays_only),
+            name=f"job-{name}", daemon=True
+        )
+        _jobs[name] = thread
+    thread.start()
+    return True
@@ -0,0 +1,242 @@
+"""
+Top-k similar-stock index over the full NSE universe
+
+Each ticker is embedded as its centered daily returns over the last WINDOW
+trading days, normalized to unit length. For two tickers that traded on
+every day of the window the dot product of their embeddings is their
+Pearson correlation. Days a ticker has no bar count as an average-return
+day, so with partial overlap the score is a correlation shrunk towards
+zero (by roughly the share of days missing), not the correlation over the
+days both traded. The float32 embedding matrix is built
+offline and memory-mapped read-only by every worker; queries are blocked
+matrix products with a running top-k.
+
+Build with (one symbol per line in the universe file):
+    python -m services.similarity_index --universe nse_symbols.txt
+"""
+import os
+import sys
+import glob
+import json
+import fcntl
+import time
+import threading
+import numpy as np
+from services import price_store
+from services.correlation import returns_panel
+from services.scheduler import schedule_daily
+
+INDEX_PATH = os.environ.get("INVESTEZY_SIMILARITY_INDEX", "store/similarity_index.json")
+
+# Symbols to index, one per line (default: everything in the price store)
+UNIVERSE_FILE = os.environ.get("INVESTEZY_UNIVERSE_FILE")
+
+WINDOW = int(os.environ.get("INVESTEZY_SIMILARITY_WINDOW", 252))
+
+# Tickers with fewer return days than this in the window are left out
+MIN_DAYS = 60
+
+# Rows of the embedding matrix multiplied per block
+BLOCK_SIZE = 4096
+
+# After the correlation job (16:30 IST)
+REFRESH_HOUR, REFRESH_MINUTE = 16, 45
+
+
+def build_embeddings(returns):
+    """
+    Unit-length centered return vectors, one row per ticker
+
+    Missing days are filled with the ticker's mean return (zero after
+    centering), so they add nothing to dot products or norms.
+
+    Args:
+        returns: (days x tickers) daily returns, NaN where a ticker has no bar
+
+    Returns:
+        (embeddings, keep) where embeddings is float32 (kept tickers x days)
+        and keep is a boolean mask of tickers with enough data
+    """
+    valid = ~np.isnan(returns)
+    keep = valid.sum(axis=0) >= MIN_DAYS
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nanmean(np.where(valid, returns, np.nan), axis=0)
+        centered = np.where(valid, returns - mean, 0.0)
+        norms = np.linalg.norm(centered, axis=0)
+        keep &= norms > 0
+        embeddings = (centered[:, keep] / norms[keep]).T
+    return np.ascontiguousarray(embeddings, dtype=np.float32), keep
+
+
+def _merge_top_k(best_scores, best_ids, scores, ids, k):
+    """Keep the k largest scores across the running best and a new block"""
+    all_scores = np.concatenate([best_scores, scores], axis=1)
+    all_ids = np.concatenate([best_ids, np.broadcast_to(ids, scores.shape)], axis=1)
+    if all_scores.shape[1] > k:
+        top = np.argpartition(-all_scores, k - 1, axis=1)[:, :k]
+        all_scores = np.take_along_axis(all_scores, top, axis=1)
+        all_ids = np.take_along_axis(all_ids, top, axis=1)
+    return all_scores, all_ids
+
+
+class SimilarityIndex:
+    """Read-only, memory-mapped similarity index"""
+
+    def __init__(self, tickers, embeddings, meta=None):
+        self.tickers = list(tickers)
+        self.index = {t: i for i, t in enumerate(self.tickers)}
+        self.embeddings = embeddings
+        self.meta = meta or {}
+
+    def __contains__(self, ticker):
+        return ticker in self.index
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def search(self, tickers, k=2, exclude=(), largest=True):
+        """
+        The k most (or least) correlated universe tickers for each query ticker
+
+        Returns a dictionary of query ticker -> list of (ticker, correlation),
+        best first, skipping each query ticker itself, `exclude` and unknown
+        tickers.
+        """
+        queries = list(dict.fromkeys(t for t in tickers if t in self.index))
+        if not queries:
+            return {}
+        query_ids = np.array([self.index[t] for t in queries], dtype=np.int64)
+        vectors = np.asarray(self.embeddings[query_ids])
+        skip = np.array(sorted({self.index[t] for t in exclude if t in self.index}), dtype=np.int64)
+        sign = 1.0 if largest else -1.0
+
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.tickers), BLOCK_SIZE):
+            block = self.embeddings[start:start + BLOCK_SIZE]
+            scores = sign * (vectors @ block.T)
+            local_skip = skip[(skip >= start) & (skip < start + len(block))] - start
+            scores[:, local_skip] = -np.inf
+            own = (query_ids >= start) & (query_ids < start + len(block))
+            scores[np.flatnonzero(own), query_ids[own] - start] = -np.inf
+            ids = np.arange(start, start + len(block))
+            best_scores, best_ids = _merge_top_k(best_scores, best_ids, scores, ids, k)
+
+        results = {}
+        for row, ticker in enumerate(queries):
+            order = np.argsort(-best_scores[row], kind="stable")
+            results[ticker] = [
+                (self.tickers[best_ids[row, i]], float(sign * best_scores[row, i]))
+                for i in order if np.isfinite(best_scores[row, i])
+            ]
+        return results
+
+    def top_k(self, ticker, k=2, exclude=(), largest=True):
+        """Same interface as CorrelationMatrix.top_k"""
+        return self.search([ticker], k, exclude, largest).get(ticker, [])
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with open(path) as f:
+            meta = json.load(f)
+        data_path = os.path.join(os.path.dirname(path), meta["embeddings"])
+        embeddings = np.load(data_path, mmap_mode="r")
+        return cls(meta["tickers"], embeddings, meta)
+
+
+def build_index(tickers, window=WINDOW, path=INDEX_PATH):
+    """
+    Build the index from the price store and publish it atomically
+
+    Embeddings go to a new versioned .npy file; the JSON manifest pointing at
+    it is replaced last, so workers never see a half-written index.
+    """
+    started = time.time()
+    tickers = list(dict.fromkeys(tickers))
+    bars, errors = price_store.sync_many(tickers)
+    days, returns = returns_panel(bars, tickers)
+    days, returns = days[-window:], returns[-window:]
+    embeddings, keep = build_embeddings(returns)
+    kept = [t for t, k in zip(tickers, keep) if k]
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    built_at = int(time.time())
+    # Unique per build, so overlapping builds never truncate a file workers have mapped
+    name = f"{stem}.{time.time_ns()}-{os.getpid()}.npy"
+
+    meta = {
+        "tickers": kept,
+        "embeddings": name,
+        "window": int(window),
+        "firstDay": str(np.datetime64(int(days[0]), "D")) if len(days) else None,
+        "lastDay": str(np.datetime64(int(days[-1]), "D")) if len(days) else None,
+        "builtAt": built_at
+    }
+    # One build publishes at a time, so cleanup can't remove another build's unpublished file
+    with open(f"{path}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        np.save(os.path.join(directory, name), embeddings)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+        # Old embedding files stay mapped in running workers until they reload
+        for old in glob.glob(os.path.join(directory, f"{stem}.*.npy")):
+            if os.path.basename(old) != name:
+                os.remove(old)
+
+    print(f"Similarity index: {len(kept)} of {len(tickers)} tickers, {len(days)} days, "
+          f"{len(errors)} errors in {time.time() - started:.2f}s")
+    return SimilarityIndex(kept, embeddings, meta)
+
+
+_cached = None
+_cached_mtime = None
+_cache_lock = threading.Lock()
+
+
+def get_similarity_index():
+    """The published index, reloaded when a new one is built (None if missing)"""
+    global _cached, _cached_mtime
+    try:
+        mtime = os.path.getmtime(INDEX_PATH)
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached is None or mtime != _cached_mtime:
+            try:
+                _cached = SimilarityIndex.load(INDEX_PATH)
+                _cached_mtime = mtime
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load similarity index: {str(e)}")
+        return _cached
+
+
+def load_universe(path=None):
+    """Symbols from a universe file, or everything in the price store"""
+    path = path or UNIVERSE_FILE
+    if not path:
+        return price_store.stored_tickers()
+    with open(path) as f:
+        symbols = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return [s if "." in s or s.startswith("^") else f"{s}.NS" for s in symbols]
+
+
+def schedule_refresh():
+    """Rebuild the index every trading day after market close"""
+    return schedule_daily(
+        "similarity_index", REFRESH_HOUR, REFRESH_MINUTE, lambda: build_index(load_universe())
+    )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    universe_file = None
+    if "--universe" in args:
+        i = args.index("--universe")
+        universe_file = args[i + 1]
+        args = args[:i] + args[i + 2:]
+    build_index(args or load_universe(universe_file))
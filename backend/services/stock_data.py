@@ -1,53 +1,180 @@
-import yfinance as yf
+import os
 import pandas as pd
-import time
-from utils.stock_utils import get_stock_metrics
+from services import price_store, price_panel, metrics_table
+from utils.resilience import CircuitOpenError, DeadlineExceeded
+from utils.cache import TTLCache
+from utils.stock_utils import get_stock_metrics, get_stock_metrics_batch
 
-def get_stock_data(ticker, years=5, retries=3, with_metrics=False):
+# Shared by all request threads; concurrent misses on one key trigger a single fetch
+_stock_cache = TTLCache(
+    "stock_data",
+    maxsize=int(os.environ.get("INVESTEZY_CACHE_SIZE", 512)),
+    ttl=int(os.environ.get("INVESTEZY_CACHE_TTL", 300)),
+    max_bytes=int(os.environ.get("INVESTEZY_CACHE_MB", 128)) * 1024 * 1024
+)
+
+def _is_cacheable(result):
+    return not (isinstance(result, dict) and "error" in result)
+
+def normalize_ticker(ticker):
+    """Ensure proper suffix for Indian stocks"""
+    ticker = ticker.strip()
+    if '.' not in ticker:
+        ticker = f"{ticker}.NS"
+    return ticker
+
+def get_stock_data(ticker, years=5, with_metrics=False):
     """
-    Get stock data with improved error handling and retries
+    Get stock data with improved error handling
+
+    History is sliced from the shared price panel when it covers the
+    ticker and the whole window, else served from the local price store, which only downloads
+    bars newer than the last stored date. Results are cached in-process
+    per (ticker, years, with_metrics).
     
     Args:
         ticker: Stock symbol (with or without .NS suffix)
         years: Years of historical data to fetch
-        retries: Number of retry attempts
         with_metrics: Whether to calculate metrics or just return raw data
     
     Returns:
         If with_metrics=True: Dictionary with stock metrics
         If with_metrics=False: DataFrame with stock data
     """
-    # Ensure proper suffix for Indian stocks
-    if '.' not in ticker:
-        ticker = f"{ticker}.NS"
+    ticker = normalize_ticker(ticker)
+
+    result = _stock_cache.get_or_load(
+        (ticker, years, with_metrics),
+        lambda: _load_stock_data(ticker, years, with_metrics),
+        cacheable=_is_cacheable
+    )
+    # Callers add keys to metrics dicts, so hand out a copy
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+def _load_stock_data(ticker, years, with_metrics):
+    """Fetch stock data from the price store, bypassing the cache"""
+    if with_metrics:
+        # Precomputed after market close for the tracked universe
+        materialized = metrics_table.lookup(ticker, years)
+        if materialized is not None:
+            return materialized
+
+    panel = price_panel.get_price_panel()
+    if panel is not None and panel.covers(ticker, years + 1):
+        # A view of the memory-mapped panel shared by every worker
+        closes = panel.frame([ticker], years + 1)
+        if len(closes) < 252:  # Less than a year of trading days
+            return {"error": f"Insufficient data for {ticker}", "success": False}
+        if with_metrics:
+            return get_stock_metrics_batch(closes.to_numpy(), closes.index.values, [ticker], years)[ticker]
+        return closes
+
+    try:
+        # Upstream retries, backoff and the circuit breaker live in the provider;
+        # if upstream is down the store falls back to the last bars it has
+        hist = price_store.get_history(ticker, years + 1)
+    except CircuitOpenError:
+        return {"error": f"Market data is temporarily unavailable for {ticker}", "success": False}
+    except DeadlineExceeded:
+        return {"error": f"Timed out fetching data for {ticker}", "success": False}
+    except Exception as e:
+        return {"error": str(e), "success": False}
+
+    # Check if we got valid data
+    if hist.empty:
+        return {"error": f"No data available for {ticker}", "success": False}
+        
+    if len(hist) < 252:  # Less than a year of trading days
+        return {"error": f"Insufficient data for {ticker}", "success": False}
     
-    # Try multiple times to account for network issues
-    for attempt in range(retries):
+    # Return metrics if requested
+    if with_metrics:
+        return get_stock_metrics(hist, ticker, years)
+        
+    # Return only Close price, renamed to the ticker
+    return hist[['Close']].rename(columns={'Close': ticker})
+
+def get_stock_data_many(tickers, years=5, with_metrics=False):
+    """
+    Get stock data for several tickers with batched upstream downloads
+
+    Cached tickers are served from memory and tickers the shared price
+    panel covers for the whole window are sliced from it; the rest are synced with the price store in
+    as few upstream requests as possible.
+
+    Args:
+        tickers: List of stock symbols (with or without .NS suffix)
+        years: Years of historical data to fetch
+        with_metrics: Whether to calculate metrics or just return prices
+
+    Returns:
+        (data, errors) where errors maps ticker -> message and data is
+        If with_metrics=True: Dictionary of ticker -> metrics, in input order
+        If with_metrics=False: DataFrame of Close prices, dates x tickers
+    """
+    ordered = list(dict.fromkeys(normalize_ticker(t) for t in tickers if t and t.strip()))
+
+    results, errors = {}, {}
+    missing = []
+    for ticker in ordered:
+        cached = _stock_cache.get((ticker, years, with_metrics))
+        if cached is not None:
+            results[ticker] = cached
+        else:
+            missing.append(ticker)
+
+    if missing and with_metrics:
+        for ticker, result in metrics_table.lookup_many(missing, years).items():
+            _stock_cache.set((ticker, years, with_metrics), result)
+            results[ticker] = result
+        missing = [t for t in missing if t not in results]
+
+    if missing:
+        fetched = {}
+        panel = price_panel.get_price_panel()
+        if panel is not None:
+            for ticker in missing:
+                if panel.covers(ticker, years + 1):
+                    closes = panel.frame([ticker], years + 1)
+                    if len(closes) < 252:  # Less than a year of trading days
+                        errors[ticker] = f"Insufficient data for {ticker}"
+                    else:
+                        fetched[ticker] = closes
+            missing = [t for t in missing if t not in fetched and t not in errors]
+
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=f"{years+1}y")
-            
-            # Check if we got valid data
-            if hist.empty:
-                if attempt < retries-1:
-                    time.sleep(1)  # Wait before retry
-                    continue
-                return {"error": f"No data available for {ticker}", "success": False}
-                
-            if len(hist) < 252:  # Less than a year of trading days
-                return {"error": f"Insufficient data for {ticker}", "success": False}
-            
-            # Return metrics if requested
-            if with_metrics:
-                return get_stock_metrics(hist, ticker, years)
-                
-            # Return only Close price, renamed to the ticker
-            return hist[['Close']].rename(columns={'Close': ticker})
-            
+            bars, fetch_errors = price_store.sync_many(missing) if missing else ({}, {})
         except Exception as e:
-            if attempt < retries-1:
-                time.sleep(1)  # Wait before retry
+            bars, fetch_errors = {}, {ticker: str(e) for ticker in missing}
+        errors.update(fetch_errors)
+
+        for ticker, rows in bars.items():
+            hist = price_store.rows_to_frame(price_store.slice_years(rows, years + 1))
+            if len(hist) < 252:  # Less than a year of trading days
+                errors[ticker] = f"Insufficient data for {ticker}"
                 continue
-            return {"error": str(e), "success": False}
-            
-    return {"error": "Data fetch failed after retries", "success": False}  # If all retries failed
\ No newline at end of file
+            fetched[ticker] = hist[['Close']].rename(columns={'Close': ticker})
+
+        if with_metrics and fetched:
+            # One vectorized pass over the aligned price matrix
+            panel = pd.concat(fetched.values(), axis=1)
+            metrics = get_stock_metrics_batch(panel.to_numpy(), panel.index.values, list(panel.columns), years)
+            for ticker, result in metrics.items():
+                if "error" in result:
+                    errors[ticker] = result["error"]
+                    del fetched[ticker]
+                else:
+                    fetched[ticker] = result
+
+        for ticker, result in fetched.items():
+            _stock_cache.set((ticker, years, with_metrics), result)
+            results[ticker] = result
+
+    if with_metrics:
+        return {t: dict(results[t]) for t in ordered if t in results}, errors
+
+    frames = [results[t] for t in ordered if t in results]
+    panel = pd.concat(frames, axis=1) if frames else pd.DataFrame()
+    return panel, errors
@@ -0,0 +1,23 @@
+import pytest
+import app as app_module
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # No warm-up thread (model load, fundamentals refresher) for request validation tests
+    monkeypatch.setattr(app_module, "start_background_work", lambda: None)
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize("body", [
+    {"portfolios": {"me": "TCS.NS"}},
+    {"portfolios": {"me": ["TCS.NS", 5]}},
+    {"portfolios": ["TCS.NS"]},
+    {"emails": "demo@stockai.com"},
+    {"emails": [["demo@stockai.com"]]},
+    ["demo@stockai.com"],
+])
+def test_recommend_batch_rejects_malformed_input(client, body):
+    response = client.post("/api/recommend/batch", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["success"] is False
@@ -0,0 +1,18 @@
+from utils.cache import TTLCache
+
+
+def test_get_counts_hits_and_misses():
+    cache = TTLCache("test-get")
+    assert cache.get("k") is None
+    cache.set("k", 1)
+    assert cache.get("k") == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hitRate"]) == (1, 1, 0.5)
+
+
+def test_get_or_load_counts_one_miss_per_load():
+    cache = TTLCache("test-load")
+    assert cache.get_or_load("k", lambda: 1) == 1
+    assert cache.get_or_load("k", lambda: 2) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
@@ -0,0 +1,40 @@
+import numpy as np
+from services.correlation import CorrelationMatrix
+
+
+def _panel(n_days=400, n_tickers=6, seed=11):
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0, 0.01, (n_days, 1))
+    returns = common + rng.normal(0, 0.01, (n_days, n_tickers))
+    returns[rng.random((n_days, n_tickers)) < 0.05] = np.nan
+    returns[:150, 0] = np.nan  # Listed later
+    return 20000 + np.arange(n_days), returns
+
+
+def _rebuilt(days, returns, window):
+    corr = CorrelationMatrix([f"T{i}" for i in range(returns.shape[1])], window)
+    corr.rebuild(days, returns)
+    return corr
+
+
+def test_append_matches_rebuild():
+    days, returns = _panel()
+    corr = _rebuilt(days[:300], returns[:300], 252)
+    for start in range(300, 400, 7):
+        corr.append(days[start:start + 7], returns[start:start + 7])
+
+    expected = _rebuilt(days, returns, 252)
+    np.testing.assert_array_equal(corr.days, expected.days)
+    np.testing.assert_allclose(corr.matrix, expected.matrix, atol=1e-10)
+
+
+def test_append_replaces_a_partial_last_day():
+    days, returns = _panel()
+    partial = returns[:301].copy()
+    partial[-1] += 0.02  # Intraday bar, later replaced by the close
+    corr = _rebuilt(days[:301], partial, 252)
+
+    assert corr.append(days[300:320], returns[300:320]) == 19
+
+    expected = _rebuilt(days[:320], returns[:320], 252)
+    np.testing.assert_allclose(corr.matrix, expected.matrix, atol=1e-10)
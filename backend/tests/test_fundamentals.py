@@ -0,0 +1,13 @@
+import json
+from services import fundamentals
+
+
+def test_get_fundamentals_reads_disk_without_starting_refresher(tmp_path, monkeypatch):
+    path = tmp_path / "fundamentals.json"
+    path.write_text(json.dumps({"TCS.NS": {"longName": "Tata Consultancy", "updatedAt": 1}}))
+    monkeypatch.setattr(fundamentals, "FUNDAMENTALS_PATH", str(path))
+    monkeypatch.setattr(fundamentals, "_records", {})
+    monkeypatch.setattr(fundamentals, "_loaded_mtime", None)
+
+    assert fundamentals.get_company_name("TCS.NS") == "Tata Consultancy"
+    assert fundamentals._refresher is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from utils import incremental_stats
+from utils.incremental_stats import CLOSE, IncrementalMetrics, RunningWindow
+
+START_DAY = 19000
+
+
+def _rows(n, seed=3):
+    rng = np.random.default_rng(seed)
+    rows = np.zeros((n, 6))
+    rows[:, 0] = START_DAY + np.arange(n)
+    rows[:, CLOSE] = 1000 * np.exp(np.cumsum(rng.normal(0.0005, 0.015, n)))
+    return rows
+
+
+def _from_scratch(rows, years):
+    return IncrementalMetrics().update("TEST.NS", rows, years, START_DAY + 200)
+
+
+def _assert_same(incremental, scratch):
+    for section, key in [("risk", "fluctuation"), ("stability", "score"), ("returns", "cagr")]:
+        assert incremental[section][key] == pytest.approx(scratch[section][key], rel=1e-9)
+    assert incremental["risk"]["meter"] == scratch["risk"]["meter"]
+    assert incremental["chartData"] == scratch["chartData"]
+
+
+def test_incremental_matches_rebuild_after_readjust():
+    rows = _rows(900)
+    engine = IncrementalMetrics()
+    for n in range(600, 899):
+        engine.update("TEST.NS", rows[:n], 1, START_DAY + 200)
+
+    # A 2:1 split: upstream halves all history, then one new bar arrives
+    readjusted = rows.copy()
+    readjusted[:-1, CLOSE] /= 2
+    result = engine.update("TEST.NS", readjusted, 1, START_DAY + 200)
+
+    _assert_same(result, _from_scratch(readjusted, 1))
+
+
+def test_incremental_matches_rebuild_after_partial_bar_rewrite():
+    rows = _rows(700)
+    engine = IncrementalMetrics()
+    partial = rows.copy()
+    partial[-1, CLOSE] *= 1.03
+    engine.update("TEST.NS", partial, 1, START_DAY + 200)
+    window = engine.windows[("TEST.NS", 1)]
+
+    assert window.update(rows, START_DAY + 200)
+    _assert_same(engine.update("TEST.NS", rows, 1, START_DAY + 200), _from_scratch(rows, 1))
+
+
+def test_running_sums_are_rebuilt_periodically():
+    rows = _rows(400)
+    window = RunningWindow()
+    results = [window.update(rows[:n], START_DAY) for n in range(300, 300 + 2 * incremental_stats.RESUM_INTERVAL + 3)]
+    assert results.count(False) == 3
+    assert window.updates < incremental_stats.RESUM_INTERVAL
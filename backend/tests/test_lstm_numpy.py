@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from services import model_registry
+from utils.lstm_numpy import NumpyLSTM
+
+
+def _windows(n=16):
+    return np.random.default_rng(1).random((n, model_registry.SEQUENCE_LENGTH, 1), dtype=np.float32)
+
+
+def _reference(windows, path):
+    """Plain float64 LSTM/Dense forward pass, one sample and one step at a time"""
+    with np.load(path) as data:
+        layers = [(str(kind), {k[len(f"{n}_"):]: data[k] for k in data.files if k.startswith(f"{n}_")})
+                  for n, kind in enumerate(data["layers"])]
+
+    def sigmoid(x):
+        return 1 / (1 + np.exp(-x))
+
+    outputs = []
+    for sample in windows.astype(np.float64):
+        x = sample
+        for kind, w in layers:
+            if kind == "lstm":
+                units = w["recurrent_kernel"].shape[0]
+                h, c, sequence = np.zeros(units), np.zeros(units), []
+                for step in x:
+                    z = step @ w["kernel"] + h @ w["recurrent_kernel"] + w["bias"]
+                    i, f, g, o = np.split(z, 4)
+                    c = sigmoid(f) * c + sigmoid(i) * np.tanh(g)
+                    h = sigmoid(o) * np.tanh(c)
+                    sequence.append(h)
+                x = np.array(sequence) if bool(w["return_sequences"]) else h
+            else:
+                assert str(w["activation"]) == "linear"
+                x = x @ w["kernel"] + w["bias"]
+        outputs.append(x)
+    return np.array(outputs)
+
+
+def test_committed_weights_match_reference_forward_pass():
+    windows = _windows()
+    served = model_registry._load(model_registry.MODEL_PATH, 0).step(windows)
+    assert served.shape == (len(windows), 1)
+    np.testing.assert_allclose(served, _reference(windows, model_registry.MODEL_PATH), atol=1e-6)
+
+
+def test_committed_weights_match_keras_model():
+    pytest.importorskip("tensorflow")
+    windows = _windows()
+    keras_model = model_registry._load_keras(model_registry.KERAS_MODEL_PATH, 0)
+    served = NumpyLSTM.load(model_registry.MODEL_PATH)(windows)
+    np.testing.assert_allclose(served, keras_model.step(windows), atol=1e-6)
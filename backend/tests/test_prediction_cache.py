@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from services import market_data, model_registry, prediction, prediction_cache, price_panel, price_store
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(prediction_cache, "PREDICTION_CACHE_PATH", str(tmp_path / "predictions.db"))
+    return prediction_cache
+
+
+def test_lookup_matches_bar_model_and_method(cache):
+    cache.store("TCS.NS", 100, "v1", "lstm", [1.0, 2.0, 3.0])
+    assert cache.lookup("TCS.NS", 100, "v1", "lstm", 2) == [1.0, 2.0, 3.0]
+    assert cache.lookup("TCS.NS", 101, "v1", "lstm", 2) is None
+    assert cache.lookup("TCS.NS", 100, "v2", "lstm", 2) is None
+    assert cache.lookup("TCS.NS", 100, "v1", "moving_average", 2) is None
+    assert cache.lookup("TCS.NS", 100, "v1", "lstm", 4) is None
+
+
+def test_store_replaces_the_previous_row(cache):
+    cache.store("TCS.NS", 100, "v1", "lstm", [1.0, 2.0])
+    cache.store("TCS.NS", 101, "v1", "lstm", [3.0])
+    assert cache.lookup("TCS.NS", 100, "v1", "lstm", 1) is None
+    assert cache.lookup("TCS.NS", 101, "v1", "lstm", 1) == [3.0]
+
+
+class _Model:
+    """Stands in for a loaded model; counts forward passes"""
+
+    def __init__(self, version):
+        self.version = version
+        self.calls = 0
+
+    def step(self, windows):
+        self.calls += 1
+        return windows[:, -1]
+
+
+def test_predictions_are_reused_until_a_new_bar_or_model(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path / "prices"))
+    monkeypatch.setattr(price_panel, "PANEL_PATH", str(tmp_path / "price_panel.json"))
+    replay = market_data.ReplayProvider(synthetic_years=3)
+    monkeypatch.setattr(market_data, "_provider", market_data.ResilientProvider(replay))
+    model = _Model("v1")
+    monkeypatch.setattr(model_registry, "get_model", lambda: model)
+    frame = replay._frame("TCS.NS")
+    replay._frames["TCS.NS"] = frame.iloc[:-1]
+
+    prediction.predict_stocks(["TCS"], 10)
+    prediction.predict_stocks(["TCS"], 5)
+    assert model.calls == prediction.DEFAULT_HORIZON
+
+    # A new bar arrives: the cached forecast no longer applies
+    replay._frames["TCS.NS"] = frame
+    monkeypatch.setattr(price_store, "REFRESH_INTERVAL", 0)
+    prediction.predict_stocks(["TCS"], 10)
+    assert model.calls == 2 * prediction.DEFAULT_HORIZON
+
+    # A new model is loaded
+    model.version = "v2"
+    again, _ = prediction.predict_stocks(["TCS"], 10)
+    assert model.calls == 3 * prediction.DEFAULT_HORIZON
+    assert again["TCS.NS"]["modelVersion"] == "v2"
+
+
+class _ThreadPool(ThreadPoolExecutor):
+    def __init__(self, max_workers, mp_context=None):
+        super().__init__(max_workers)
+
+
+def test_precompute_skips_a_failed_chunk(cache, monkeypatch):
+    monkeypatch.setattr(price_store, "sync_many", lambda tickers, force=False: ({}, {}))
+    monkeypatch.setattr(prediction_cache, "ProcessPoolExecutor", _ThreadPool)
+    monkeypatch.setattr(prediction_cache, "PRECOMPUTE_WORKERS", 3)
+
+    def forecast_chunk(tickers, days):
+        if "BAD.NS" in tickers:
+            raise RuntimeError("worker died")
+        return len(tickers), {}
+    monkeypatch.setattr(prediction_cache, "_forecast_chunk", forecast_chunk)
+
+    summary = prediction_cache.precompute_forecasts(["A.NS", "B.NS", "BAD.NS", "C.NS", "D.NS", "E.NS"])
+    assert summary["forecast"] == 4
+    assert summary["failedChunks"] == 1
+    assert summary["errors"] == 2
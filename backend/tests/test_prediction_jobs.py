@@ -0,0 +1,74 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from services import prediction_cache, prediction_jobs
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    db = str(tmp_path / "predictions.db")
+    monkeypatch.setattr(prediction_cache, "PREDICTION_CACHE_PATH", db)
+    # Spawned processes (forecast workers, the "other API worker") read these
+    for name, value in {
+        "INVESTEZY_PREDICTION_CACHE": db,
+        "INVESTEZY_PROVIDER": "replay",
+        "INVESTEZY_PRICE_STORE": str(tmp_path / "prices"),
+        "INVESTEZY_PRICE_PANEL": str(tmp_path / "price_panel.json"),
+        "INVESTEZY_FUNDAMENTALS": str(tmp_path / "fundamentals.json")
+    }.items():
+        monkeypatch.setenv(name, value)
+    # A fresh dispatcher for this database
+    monkeypatch.setattr(prediction_jobs, "_dispatcher", None)
+    monkeypatch.setattr(prediction_jobs, "_is_dispatcher", False)
+    return prediction_jobs
+
+
+@pytest.fixture
+def no_dispatcher(jobs, monkeypatch):
+    monkeypatch.setattr(jobs, "_ensure_dispatcher", lambda: None)
+    return jobs
+
+
+def test_identical_jobs_share_an_id(no_dispatcher):
+    first = no_dispatcher.submit("TCS", 10)
+    assert no_dispatcher.submit("TCS.NS", 10).id == first.id
+    assert no_dispatcher.submit("TCS", 11).id != first.id
+    assert no_dispatcher.submit_batch(["TCS", "INFY"], 10).id == no_dispatcher.submit_batch(["TCS.NS", "INFY"], 10).id
+
+
+def test_queue_full_counts_jobs_from_every_process(no_dispatcher, monkeypatch):
+    monkeypatch.setattr(no_dispatcher, "MAX_PENDING", 2)
+    no_dispatcher.submit("TCS", 10)
+    no_dispatcher.submit("INFY", 10)
+    with pytest.raises(no_dispatcher.QueueFull):
+        no_dispatcher.submit("WIPRO", 10)
+    assert no_dispatcher.queue_stats()["inFlight"] == 2
+
+
+def test_job_runs_and_is_visible_to_other_processes(jobs):
+    job = jobs.submit("TCS", 5)
+    assert job.wait(60)
+    assert job.status == "done"
+    assert job.result["success"] and len(job.result["predictions"]) == 5
+
+    # Another API worker process polling the same job id
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as other_worker:
+        polled = other_worker.submit(prediction_jobs.get_job, job.id).result()
+    assert polled.status == "done"
+    assert polled.result == job.result
+    assert jobs.queue_stats()["dispatcher"] is True
+
+
+def test_dispatcher_requeues_jobs_left_running(jobs, monkeypatch):
+    start_dispatcher = jobs._ensure_dispatcher
+    monkeypatch.setattr(jobs, "_ensure_dispatcher", lambda: None)
+    job = jobs.submit("INFY", 5)
+    # As if the process that was running it had exited
+    conn = jobs._connect()
+    conn.execute("UPDATE prediction_jobs SET status = 'running'")
+    conn.close()
+
+    start_dispatcher()
+    assert job.wait(60)
+    assert job.status == "done"
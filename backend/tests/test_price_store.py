@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from services import market_data, price_store
+
+
+class RecordingProvider(market_data.ReplayProvider):
+    """Synthetic replay data that remembers each download's tickers and start"""
+
+    def __init__(self):
+        super().__init__(synthetic=True, synthetic_years=2)
+        self.downloads = []
+
+    def download(self, tickers, period=None, start=None):
+        self.downloads.append((tuple(tickers), period, start))
+        return super().download(tickers, period, start)
+
+
+@pytest.fixture
+def provider(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path / "prices"))
+    replay = RecordingProvider()
+    monkeypatch.setattr(market_data, "_provider", market_data.ResilientProvider(replay))
+    return replay
+
+
+def _store_truncated(provider, ticker, drop):
+    rows = price_store.frame_to_rows(provider._frame(ticker))
+    price_store.save_bars(ticker, rows[:-drop])
+    return rows
+
+
+def test_sync_many_groups_stale_tickers_by_check_day(provider):
+    recent = _store_truncated(provider, "AAA.NS", 2)
+    lagging = _store_truncated(provider, "BBB.NS", 200)
+    _store_truncated(provider, "CCC.NS", 2)
+
+    bars, errors = price_store.sync_many(["AAA.NS", "BBB.NS", "CCC.NS"], force=True)
+
+    assert not errors
+    starts = {tickers: start for tickers, _, start in provider.downloads}
+    assert starts[("AAA.NS", "CCC.NS")] == str(np.datetime64(int(recent[-4, 0]), "D"))
+    assert starts[("BBB.NS",)] == str(np.datetime64(int(lagging[-202, 0]), "D"))
+    np.testing.assert_array_equal(bars["BBB.NS"], lagging)
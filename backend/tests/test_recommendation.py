@@ -0,0 +1,57 @@
+import random
+import pytest
+from models import recommendation
+from services import correlation, market_data, price_panel, price_store, similarity_index, stock_data
+from services.demo_data import demo_portfolios
+
+DEMO_PORTFOLIOS = {
+    email: [s for stocks in portfolio.values() for s in stocks]
+    for email, portfolio in demo_portfolios.items()
+}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path / "prices"))
+    monkeypatch.setattr(price_panel, "PANEL_PATH", str(tmp_path / "price_panel.json"))
+    monkeypatch.setattr(correlation, "CORRELATION_PATH", str(tmp_path / "correlation.npz"))
+    monkeypatch.setattr(correlation, "_cached", None)
+    monkeypatch.setattr(similarity_index, "INDEX_PATH", str(tmp_path / "similarity_index.json"))
+    monkeypatch.setattr(market_data, "_provider", market_data.ResilientProvider(
+        market_data.ReplayProvider(synthetic_years=3)
+    ))
+    # Reasons are picked at random; take the first so responses can be compared
+    monkeypatch.setattr(random, "choice", lambda options: options[0])
+    stock_data._stock_cache.invalidate()
+    yield tmp_path
+    stock_data._stock_cache.invalidate()
+
+
+def _assert_batch_matches_single():
+    batch = recommendation.get_recommendations_batch(DEMO_PORTFOLIOS)
+    for email, portfolio in DEMO_PORTFOLIOS.items():
+        assert batch[email] == recommendation.get_recommendations(portfolio), email
+
+
+def test_batch_matches_single_with_live_correlation(store):
+    _assert_batch_matches_single()
+
+
+def test_batch_matches_single_with_correlation_matrix(store):
+    universe = recommendation.RECOMMENDATION_UNIVERSE[:12]
+    bars, _ = price_store.sync_many(universe)
+    corr = correlation.CorrelationMatrix(universe)
+    corr.rebuild(*correlation.returns_panel(bars, universe))
+    corr.save(correlation.CORRELATION_PATH)
+    assert correlation.get_correlation_matrix() is not None
+    _assert_batch_matches_single()
+
+
+def test_unknown_tickers_are_not_a_new_sector():
+    picks = recommendation._select_recommendations(
+        {"TCS.NS": [("NOTLISTED.NS", 0.8), ("ITC.NS", 0.7)]},
+        recommendation.CATALOG.in_sectors({"IT"}), 3
+    )
+    reasons = {rec["ticker"]: rec["reason"] for rec in picks}
+    assert "Adds a new sector" not in reasons["NOTLISTED.NS"]
+    assert reasons["ITC.NS"].startswith("Adds a new sector (FMCG)")
@@ -0,0 +1,62 @@
+import time
+import pytest
+from utils.resilience import CircuitBreaker, CircuitOpenError, Deadline, DeadlineExceeded, call_with_retry
+
+
+def _fail():
+    raise ConnectionError("upstream down")
+
+
+def _open_breaker(name):
+    """A breaker that was opened by one failure and is now half-open"""
+    breaker = CircuitBreaker(name, failure_threshold=1, reset_timeout=0.05)
+    with pytest.raises(ConnectionError):
+        call_with_retry(_fail, breaker=breaker, retries=1)
+    assert breaker.state == "open"
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_half_open_success_closes():
+    breaker = _open_breaker("test-success")
+    assert call_with_retry(lambda: "ok", breaker=breaker, retries=1) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_half_open_failure_reopens():
+    breaker = _open_breaker("test-failure")
+    with pytest.raises(ConnectionError):
+        call_with_retry(_fail, breaker=breaker, retries=1)
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(lambda: "ok", breaker=breaker, retries=1)
+
+
+def test_half_open_allows_one_trial_at_a_time():
+    breaker = _open_breaker("test-single-trial")
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_expired_deadline_does_not_take_the_trial():
+    breaker = _open_breaker("test-deadline")
+    with pytest.raises(DeadlineExceeded):
+        call_with_retry(lambda: "ok", breaker=breaker, deadline=Deadline(0), retries=1)
+    assert call_with_retry(lambda: "ok", breaker=breaker, retries=1) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_base_exception_releases_the_trial():
+    breaker = _open_breaker("test-interrupt")
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        call_with_retry(interrupted, breaker=breaker, retries=1)
+    assert breaker.state == "half_open"
+    assert call_with_retry(lambda: "ok", breaker=breaker, retries=1) == "ok"
+    assert breaker.state == "closed"
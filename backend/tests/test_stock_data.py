@@ -0,0 +1,40 @@
+import pytest
+from services import market_data, metrics_table, price_panel, price_store, stock_data
+
+TICKERS = ["TCS.NS", "INFY.NS"]
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_store, "PRICE_STORE_DIR", str(tmp_path / "prices"))
+    monkeypatch.setattr(price_panel, "PANEL_PATH", str(tmp_path / "price_panel.json"))
+    monkeypatch.setattr(price_panel, "_cached", None)
+    monkeypatch.setattr(metrics_table, "METRICS_DB_PATH", str(tmp_path / "metrics.db"))
+    monkeypatch.setattr(market_data, "_provider", market_data.ResilientProvider(
+        market_data.ReplayProvider(synthetic_years=16)
+    ))
+    price_store.sync_many(TICKERS)
+    stock_data._stock_cache.invalidate()
+    yield
+    stock_data._stock_cache.invalidate()
+
+
+def _both(fetch):
+    """The same request served from the store and from a freshly built panel"""
+    from_store = fetch()
+    stock_data._stock_cache.invalidate()
+    price_panel.build_panel(TICKERS, path=price_panel.PANEL_PATH)
+    assert price_panel.get_price_panel() is not None
+    return from_store, fetch()
+
+
+@pytest.mark.parametrize("years", [1, 5, 10, 15])
+def test_panel_matches_store(store, years):
+    from_store, from_panel = _both(lambda: stock_data.get_stock_data("TCS", years, with_metrics=True))
+    assert from_panel == from_store
+
+
+@pytest.mark.parametrize("years", [5, 15])
+def test_panel_matches_store_for_many(store, years):
+    (store_prices, _), (panel_prices, _) = _both(lambda: stock_data.get_stock_data_many(TICKERS, years))
+    assert panel_prices.equals(store_prices)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+from utils.stock_utils import CHART_DAYS, compute_metrics_batch, get_stock_metrics_batch
+
+
+def _reference(closes, years):
+    """Scalar metrics for one ticker, computed like the original get_stock_metrics"""
+    closes = pd.Series(closes).dropna().reset_index(drop=True)
+    latest_price = closes.iloc[-1]
+    years_ago_price = closes.iloc[max(0, int(len(closes) - 252 * years))]
+    daily_returns = closes.pct_change().dropna()
+    std = np.std(daily_returns)
+    stability = (daily_returns.mean() * 252 * 100 - 6) / (std * np.sqrt(252))
+    if stability > 1.5 and std * np.sqrt(252) * 100 < 15:
+        stars = 5
+    elif 1.0 <= stability <= 1.5:
+        stars = 4
+    elif 0.5 <= stability <= 1.0:
+        stars = 3
+    elif 0 <= stability <= 0.5:
+        stars = 2
+    else:
+        stars = 1
+    return {
+        "latestPrice": latest_price,
+        "growth": (latest_price / years_ago_price - 1) * 100,
+        "cagr": ((latest_price / years_ago_price) ** (1 / years) - 1) * 100,
+        "fluctuation": std * np.sqrt(252) * 100,
+        "stability": stability,
+        "stars": stars
+    }
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(7)
+    n_dates = 700
+    prices = 100 * np.exp(np.cumsum(rng.normal(0.0004, 0.015, (n_dates, 5)), axis=0))
+    prices[:300, 1] = np.nan                       # Listed later
+    prices[rng.random(n_dates) < 0.1, 2] = np.nan  # Scattered gaps
+    prices[-20:, 3] = np.nan                       # Stopped trading
+    prices[:-1, 4] = np.nan                        # A single bar
+    return prices
+
+
+@pytest.mark.parametrize("years", [1, 2, 5])
+def test_batch_matches_scalar_reference(prices, years):
+    batch = compute_metrics_batch(prices, years)
+    for i in range(4):
+        expected = _reference(prices[:, i], years)
+        for key in ("latestPrice", "growth", "cagr", "fluctuation", "stability"):
+            np.testing.assert_allclose(batch[key][i], expected[key], rtol=1e-9, err_msg=f"{key}[{i}]")
+        assert batch["stars"][i] == expected["stars"]
+
+        rows = batch["chartRows"][:, i]
+        valid_rows = np.flatnonzero(~np.isnan(prices[:, i]))
+        np.testing.assert_array_equal(rows, valid_rows[-CHART_DAYS:])
+
+
+def test_tickers_with_fewer_than_two_bars_are_errors(prices):
+    dates = pd.bdate_range("2020-01-01", periods=len(prices)).values
+    prices[:, 0] = np.nan
+    results = get_stock_metrics_batch(prices, dates, list("ABCDE"), years=1)
+    assert results["A"]["success"] is False
+    assert results["E"]["success"] is False
+    assert results["B"]["success"] is True
+    assert results["B"]["chartData"]["prices"] == prices[~np.isnan(prices[:, 1]), 1][-CHART_DAYS:].tolist()
@@ -0,0 +1,169 @@
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Every cache registers itself here so stats can be reported in one place
+_caches = {}
+
+
+def _estimate_size(value):
+    """Rough size of a cached value in bytes"""
+    if hasattr(value, "memory_usage"):
+        try:
+            return int(value.memory_usage(deep=True).sum())
+        except Exception:
+            pass
+    try:
+        return len(json.dumps(value, default=str))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _InFlight:
+    """A fetch in progress that other callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Thread-safe cache with TTL expiry, LRU eviction and a memory cap
+
+    Concurrent misses on the same key are coalesced: the first caller runs
+    the loader and everyone else waits for its result instead of hitting
+    upstream again.
+    """
+
+    def __init__(self, name, maxsize=256, ttl=300, max_bytes=64 * 1024 * 1024):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, size, value)
+        self._in_flight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def get(self, key):
+        """Return a cached value or None, counting the lookup"""
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def get_or_load(self, key, loader, cacheable=None):
+        """
+        Return the cached value for key, calling loader() on a miss
+
+        Args:
+            key: Hashable cache key
+            loader: Zero-argument function producing the value
+            cacheable: Optional predicate; values it rejects (e.g. error
+                responses) are returned but not stored
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            call = self._in_flight.get(key)
+            if call is None:
+                self.misses += 1
+                call = _InFlight()
+                self._in_flight[key] = call
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+            if call.value is not None and (cacheable is None or cacheable(call.value)):
+                with self._lock:
+                    self._store(key, call.value)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            call.done.set()
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything if key is None"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+                self._bytes = 0
+            elif key in self._data:
+                self._bytes -= self._data.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    # Callers must hold self._lock for the methods below
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, size, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self._bytes -= size
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def _store(self, key, value):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._bytes -= self._data.pop(key)[1]
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self._bytes += size
+        while self._data and (len(self._data) > self.maxsize or self._bytes > self.max_bytes):
+            _, (_, evicted_size, _) = self._data.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+
+def cache_stats():
+    """Hit/miss counters for every registered cache"""
+    return {name: cache.stats() for name, cache in _caches.items()}
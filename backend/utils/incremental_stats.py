@@ -0,0 +1,215 @@
+import os
+import json
+import math
+import numpy as np
+from utils.stock_utils import TRADING_DAYS, RISK_FREE_RATE, CHART_DAYS, classify, build_metrics
+
+# Column of the close price in stored price rows (day, Open, High, Low, Close, Volume)
+CLOSE = 4
+
+# Incremental updates before the running sums are rebuilt from scratch, so
+# floating-point drift from repeated add/remove stays bounded
+RESUM_INTERVAL = 21
+
+
+class RunningWindow:
+    """
+    Running statistics of daily returns over a sliding window of stored bars
+
+    The window covers rows [lo, hi) of a ticker's stored bars. Returns are
+    added as bars arrive at the end and removed as the window start moves
+    forward, keeping count, sum and a Welford mean/M2 so the mean and
+    standard deviation are available in O(1) without rescanning history.
+
+    The closes at the window start and of the bar before the last are kept
+    too: if either changes, stored history was rewritten (e.g. re-adjusted
+    for a split or dividend) and the sums are rebuilt.
+    """
+
+    def __init__(self, lo=0, hi=0, count=0, total=0.0, mean=0.0, m2=0.0, last_day=None, last_close=None,
+                 first_close=None, prev_close=None, updates=0):
+        self.lo = lo
+        self.hi = hi
+        self.count = count
+        self.total = total
+        self.mean = mean
+        self.m2 = m2
+        self.last_day = last_day
+        self.last_close = last_close
+        self.first_close = first_close
+        self.prev_close = prev_close
+        self.updates = updates
+
+    def _add(self, x):
+        self.count += 1
+        self.total += x
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    def _remove(self, x):
+        if self.count <= 1:
+            self.count, self.total, self.mean, self.m2 = 0, 0.0, 0.0, 0.0
+            return
+        self.count -= 1
+        self.total -= x
+        delta = x - self.mean
+        self.mean -= delta / self.count
+        self.m2 = max(0.0, self.m2 - delta * (x - self.mean))
+
+    @staticmethod
+    def _return(closes, i):
+        """Daily return of bar i (bar i-1 to bar i)"""
+        return closes[i] / closes[i - 1] - 1
+
+    @staticmethod
+    def _same(stored, close):
+        return stored is not None and (stored == close or (math.isnan(stored) and math.isnan(close)))
+
+    def _matches(self, rows):
+        """True if the stored rows still hold the bars this window was built from"""
+        if self.last_day is None or not 0 < self.hi <= len(rows) or int(rows[self.hi - 1, 0]) != self.last_day:
+            return False
+        if self.lo < self.hi and not self._same(self.first_close, float(rows[self.lo, CLOSE])):
+            return False
+        return self.hi - self.lo < 2 or self._same(self.prev_close, float(rows[self.hi - 2, CLOSE]))
+
+    def update(self, rows, start_day):
+        """
+        Bring the window up to date with the stored rows
+
+        Args:
+            rows: Stored price rows for the ticker (appended to over time)
+            start_day: Day number of the first bar inside the window
+
+        Returns True if the window was updated incrementally, False if it had
+        to be rebuilt (history was rewritten under it, or RESUM_INTERVAL
+        incremental updates have run since the last rebuild).
+        """
+        closes = rows[:, CLOSE]
+        incremental = self.updates < RESUM_INTERVAL and self._matches(rows)
+        if incremental:
+            self.updates += 1
+        else:
+            self.__init__()
+            self.lo = self.hi = int(np.searchsorted(rows[:, 0], start_day))
+
+        # The last bar may have been rewritten (partial intraday bar replaced)
+        if incremental and self.hi - self.lo >= 2 and closes[self.hi - 1] != self.last_close:
+            previous = closes[self.hi - 2]
+            self._remove(self.last_close / previous - 1)
+            self._add(self._return(closes, self.hi - 1))
+
+        # New bars at the end
+        while self.hi < len(rows):
+            if self.hi > self.lo:
+                self._add(self._return(closes, self.hi))
+            self.hi += 1
+
+        # Bars that fell out of the window at the start
+        while self.lo < self.hi and rows[self.lo, 0] < start_day:
+            self.lo += 1
+            if self.lo < self.hi:
+                self._remove(self._return(closes, self.lo))
+
+        if self.hi > 0:
+            self.last_day = int(rows[self.hi - 1, 0])
+            self.last_close = float(closes[self.hi - 1])
+        if self.lo < self.hi:
+            self.first_close = float(closes[self.lo])
+            self.prev_close = float(closes[self.hi - 2]) if self.hi - self.lo >= 2 else None
+        return incremental
+
+    def std(self):
+        return math.sqrt(self.m2 / self.count) if self.count else float("nan")
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class IncrementalMetrics:
+    """
+    Per-ticker, per-horizon running windows that produce get_stock_metrics output
+
+    Appending one bar costs O(1) per horizon; the state is persisted to a
+    JSON file so it survives restarts.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.windows = {}  # (ticker, years) -> RunningWindow
+
+    @classmethod
+    def load(cls, path):
+        engine = cls(path)
+        try:
+            with open(path) as f:
+                saved = json.load(f)
+            for key, state in saved.items():
+                ticker, years = key.rsplit("|", 1)
+                engine.windows[(ticker, int(years))] = RunningWindow(**state)
+        except (OSError, ValueError, TypeError):
+            pass
+        return engine
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {f"{ticker}|{years}": w.to_dict() for (ticker, years), w in self.windows.items()}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def is_current(self, ticker, rows, horizons):
+        """True if every horizon's window for ticker was built from exactly these rows"""
+        windows = [self.windows.get((ticker, years)) for years in horizons]
+        return all(w is not None and w.hi == len(rows) and w._matches(rows) for w in windows)
+
+    def update(self, ticker, rows, years, start_day):
+        """
+        Update the running window for (ticker, years) and return its metrics
+
+        Args:
+            ticker: Ticker symbol
+            rows: Stored price rows for the ticker
+            years: Horizon for growth and CAGR
+            start_day: Day number where the (years + 1)-year history window starts
+
+        Returns the metrics dictionary, or None if the window has under a
+        year of trading days
+        """
+        window = self.windows.get((ticker, years))
+        if window is None:
+            window = self.windows[(ticker, years)] = RunningWindow()
+        window.update(rows, start_day)
+
+        n_bars = window.hi - window.lo
+        if n_bars < TRADING_DAYS:
+            return None
+
+        closes = rows[:, CLOSE]
+        latest_price = closes[window.hi - 1]
+        years_ago_price = closes[window.lo + max(0, n_bars - TRADING_DAYS * years)]
+        growth = (latest_price / years_ago_price - 1) * 100
+        cagr = ((latest_price / years_ago_price) ** (1 / years) - 1) * 100
+
+        std = window.std()
+        fluctuation = std * math.sqrt(TRADING_DAYS) * 100
+        avg_annual_return = window.mean * TRADING_DAYS * 100
+        stability = (avg_annual_return - RISK_FREE_RATE) / (std * math.sqrt(TRADING_DAYS))
+        stars, risk_bucket = classify(stability, fluctuation)
+
+        chart = rows[max(window.lo, window.hi - CHART_DAYS):window.hi]
+        chart_dates = np.datetime_as_string(chart[:, 0].astype("int64").astype("datetime64[D]"), unit="D")
+        return build_metrics(
+            ticker,
+            latest_price=latest_price,
+            growth=growth,
+            cagr=cagr,
+            fluctuation=fluctuation,
+            stability=stability,
+            stars=stars,
+            risk_bucket=int(risk_bucket),
+            chart_dates=chart_dates.tolist(),
+            chart_prices=chart[:, CLOSE].tolist()
+        )
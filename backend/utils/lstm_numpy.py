@@ -0,0 +1,147 @@
+"""
+NumPy forward pass for the stacked LSTM built by lstm_model.build_lstm_model
+
+Serving only needs inference on a tiny network (two 50-unit LSTMs and two
+Dense layers), so the trained weights are exported once to a .npz file and
+evaluated here without importing TensorFlow. Dropout is the identity at
+inference time and is not exported.
+
+Layer math follows Keras: gates are packed as [input, forget, cell, output]
+in kernel (features x 4u), recurrent_kernel (u x 4u) and bias (4u).
+"""
+import os
+import numpy as np
+
+# Dense activations the exported model may use
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x))
+}
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def lstm_forward(inputs, kernel, recurrent_kernel, bias, return_sequences):
+    """
+    Run one LSTM layer over a batch of sequences
+
+    Args:
+        inputs: (batch, steps, features) array
+
+    Returns:
+        (batch, steps, units) if return_sequences else (batch, units)
+    """
+    batch, steps, _ = inputs.shape
+    units = recurrent_kernel.shape[0]
+    # Input projections for every step in one matrix product
+    projected = inputs @ kernel + bias
+    h = np.zeros((batch, units), dtype=inputs.dtype)
+    c = np.zeros((batch, units), dtype=inputs.dtype)
+    outputs = np.empty((batch, steps, units), dtype=inputs.dtype) if return_sequences else None
+    for t in range(steps):
+        z = projected[:, t] + h @ recurrent_kernel
+        i = _sigmoid(z[:, :units])
+        f = _sigmoid(z[:, units:2 * units])
+        g = np.tanh(z[:, 2 * units:3 * units])
+        o = _sigmoid(z[:, 3 * units:])
+        c = f * c + i * g
+        h = o * np.tanh(c)
+        if return_sequences:
+            outputs[:, t] = h
+    return outputs if return_sequences else h
+
+
+class NumpyLSTM:
+    """Exported Sequential LSTM/Dense model, callable on (batch, steps, 1) arrays"""
+
+    def __init__(self, layers):
+        self.layers = layers
+
+    def __call__(self, windows):
+        x = np.asarray(windows, dtype=np.float32)
+        for layer in self.layers:
+            if layer["type"] == "lstm":
+                x = lstm_forward(x, layer["kernel"], layer["recurrent_kernel"], layer["bias"],
+                                 layer["return_sequences"])
+            else:
+                x = ACTIVATIONS[layer["activation"]](x @ layer["kernel"] + layer["bias"])
+        return x
+
+    @classmethod
+    def load(cls, path):
+        layers = []
+        with np.load(path) as data:
+            for n, kind in enumerate(data["layers"]):
+                prefix = f"{n}_"
+                if kind == "lstm":
+                    layers.append({
+                        "type": "lstm",
+                        "kernel": data[prefix + "kernel"].astype(np.float32),
+                        "recurrent_kernel": data[prefix + "recurrent_kernel"].astype(np.float32),
+                        "bias": data[prefix + "bias"].astype(np.float32),
+                        "return_sequences": bool(data[prefix + "return_sequences"])
+                    })
+                elif kind == "dense":
+                    layers.append({
+                        "type": "dense",
+                        "kernel": data[prefix + "kernel"].astype(np.float32),
+                        "bias": data[prefix + "bias"].astype(np.float32),
+                        "activation": str(data[prefix + "activation"])
+                    })
+                else:
+                    raise ValueError(f"Unsupported layer type in {path}: {kind}")
+        return cls(layers)
+
+
+def export_weights(model, path, check_samples=32, tolerance=1e-4):
+    """
+    Write a trained Keras model's weights in the format NumpyLSTM.load reads
+
+    Only LSTM, Dense and Dropout layers are supported. After writing, the
+    NumPy forward pass is compared with Keras on random windows and a
+    ValueError is raised if they differ by more than `tolerance`.
+
+    Returns the largest absolute difference seen
+    """
+    arrays, kinds = {}, []
+    for layer in model.layers:
+        kind = type(layer).__name__
+        prefix = f"{len(kinds)}_"
+        if kind == "LSTM":
+            config = layer.get_config()
+            if config.get("activation") != "tanh" or config.get("recurrent_activation") != "sigmoid":
+                raise ValueError(f"Unsupported LSTM activations in layer {layer.name}")
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            arrays.update({
+                prefix + "kernel": kernel, prefix + "recurrent_kernel": recurrent_kernel,
+                prefix + "bias": bias, prefix + "return_sequences": np.array(config["return_sequences"])
+            })
+            kinds.append("lstm")
+        elif kind == "Dense":
+            activation = layer.get_config().get("activation", "linear")
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation in layer {layer.name}: {activation}")
+            kernel, bias = layer.get_weights()
+            arrays.update({prefix + "kernel": kernel, prefix + "bias": bias,
+                           prefix + "activation": np.array(activation)})
+            kinds.append("dense")
+        elif kind not in ("Dropout", "InputLayer"):
+            raise ValueError(f"Unsupported layer {layer.name} ({kind})")
+
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, layers=np.array(kinds), **arrays)
+
+    steps = model.input_shape[1]
+    windows = np.random.default_rng(0).random((check_samples, steps, 1), dtype=np.float32)
+    expected = model.predict(windows, verbose=0)
+    difference = float(np.max(np.abs(NumpyLSTM.load(tmp_path)(windows) - expected)))
+    if difference > tolerance:
+        os.remove(tmp_path)
+        raise ValueError(f"NumPy forward pass differs from Keras by {difference:.2e}")
+
+    os.replace(tmp_path, path)
+    return difference
@@ -0,0 +1,164 @@
+import time
+import random
+import threading
+import contextvars
+
+_current_deadline = contextvars.ContextVar("investezy_deadline", default=None)
+
+# Every breaker registers itself here so states can be reported in one place
+_breakers = {}
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time budget before the upstream call could be made"""
+
+
+class CircuitOpenError(Exception):
+    """Upstream is considered down; the call was rejected without being attempted"""
+
+
+class Deadline:
+    """Absolute point in time by which a request must be finished"""
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def set_deadline(seconds):
+    """Start a time budget for the current request; returns a token for reset_deadline"""
+    return _current_deadline.set(Deadline(seconds))
+
+
+def reset_deadline(token):
+    _current_deadline.reset(token)
+
+
+def current_deadline():
+    """The current request's Deadline, or None outside a request"""
+    return _current_deadline.get()
+
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated upstream failures
+
+    After failure_threshold consecutive failures the breaker opens and every
+    call is rejected for reset_timeout seconds. Then a single trial call is
+    let through (half-open); success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        _breakers[name] = self
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go upstream right now"""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Give up a half-open trial without an outcome, so another call can try"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            return {"state": self._state(), "consecutiveFailures": self._failures}
+
+
+def backoff_delay(attempt, base_delay=0.25, max_delay=2.0):
+    """Exponential backoff with full jitter for the given (0-based) attempt"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_retry(fn, breaker=None, deadline=None, retries=3, base_delay=0.25, max_delay=2.0):
+    """
+    Call fn() with retries, backoff and jitter, within a time budget
+
+    Retries only happen while the deadline (default: the current request's)
+    leaves room for the backoff sleep. Calls are rejected immediately with
+    CircuitOpenError while the breaker is open.
+    """
+    deadline = deadline or current_deadline()
+    last_error = None
+
+    for attempt in range(retries):
+        # Checked first: a trial granted by allow() must always be settled
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded("Request time budget exhausted")
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} upstream is unavailable")
+
+        settled = False
+        try:
+            result = fn()
+        except Exception as e:
+            last_error = e
+            if breaker is not None:
+                breaker.record_failure()
+            settled = True
+        else:
+            if breaker is not None:
+                breaker.record_success()
+            settled = True
+            return result
+        finally:
+            # e.g. KeyboardInterrupt or SystemExit from fn(): free the half-open trial
+            if breaker is not None and not settled:
+                breaker.release_trial()
+
+        if attempt == retries - 1:
+            break
+        delay = backoff_delay(attempt, base_delay, max_delay)
+        if deadline is not None and deadline.remaining() <= delay:
+            break
+        time.sleep(delay)
+
+    raise last_error
+
+
+def breaker_stats():
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
@@ -1,111 +1,215 @@
+import warnings
 import numpy as np
 import pandas as pd
-import yfinance as yf
+from services.fundamentals import get_fundamentals
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 6  # Current risk-free rate in India (approx.)
+CHART_DAYS = 30
+
+RISK_LEVELS = np.array(["Low", "Medium", "High"])
+RISK_METERS = np.array(["Safe", "Moderate Risk", "High Risk"])
+
+
+def classify(stability, fluctuation):
+    """
+    Reliability stars and risk bucket (0 = Low, 1 = Medium, 2 = High)
+
+    Works on scalars or arrays; conditions are checked in the same order as
+    the original if/elif chain.
+    """
+    stability = np.asarray(stability)
+    fluctuation = np.asarray(fluctuation)
+    stars = np.select(
+        [
+            (stability > 1.5) & (fluctuation < 15),
+            (stability >= 1.0) & (stability <= 1.5),
+            (stability >= 0.5) & (stability <= 1.0),
+            (stability >= 0) & (stability <= 0.5)
+        ],
+        [5, 4, 3, 2],
+        default=1
+    )
+    risk_bucket = np.select([fluctuation < 15, fluctuation <= 30], [0, 1], default=2)
+    return stars, risk_bucket
+
+
+def compute_metrics_batch(prices, years=5):
+    """
+    Calculate growth, risk and stability metrics for many tickers at once
+
+    Args:
+        prices: 2D array of close prices (dates x tickers), NaN where a
+            ticker has no bar. Each column is treated like its own history
+            with the missing rows removed.
+        years: Horizon for growth and CAGR
+
+    Returns:
+        Dictionary of 1D arrays (one value per ticker) plus "chartRows",
+        a (CHART_DAYS x tickers) array of row indices into `prices` for
+        the last CHART_DAYS valid bars of each ticker (-1 if missing)
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    n_dates, n_tickers = prices.shape
+    valid = ~np.isnan(prices)
+    counts = valid.sum(axis=0)
+
+    # Push each column's valid rows to the bottom, keeping their order, so
+    # "the i-th bar from the end" is the same row for every ticker
+    order = np.argsort(valid, axis=0, kind="stable")
+    packed = np.take_along_axis(prices, order, axis=0)
+    columns = np.arange(n_tickers)
+
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN columns
+        # Growth metrics
+        latest_price = packed[-1]
+        years_ago_row = (n_dates - counts) + np.maximum(0, counts - TRADING_DAYS * years)
+        years_ago_price = packed[np.minimum(years_ago_row, n_dates - 1), columns]
+        growth = (latest_price / years_ago_price - 1) * 100
+        cagr = ((latest_price / years_ago_price) ** (1 / years) - 1) * 100
+
+        # Risk metrics from daily returns (annualized volatility)
+        returns = packed[1:] / packed[:-1] - 1
+        mean_return = np.nanmean(returns, axis=0) if n_dates > 1 else np.full(n_tickers, np.nan)
+        std_return = np.nanstd(returns, axis=0) if n_dates > 1 else np.full(n_tickers, np.nan)
+        fluctuation = std_return * np.sqrt(TRADING_DAYS) * 100
+
+        # Stability Score (modified Sharpe ratio)
+        avg_annual_return = mean_return * TRADING_DAYS * 100
+        stability = (avg_annual_return - RISK_FREE_RATE) / (std_return * np.sqrt(TRADING_DAYS))
+
+    stars, risk_bucket = classify(stability, fluctuation)
+
+    chart_rows = order[-CHART_DAYS:]
+    chart_rows = np.where(np.arange(n_dates)[-CHART_DAYS:, None] >= n_dates - counts, chart_rows, -1)
+
+    return {
+        "count": counts,
+        "latestPrice": latest_price,
+        "growth": growth,
+        "cagr": cagr,
+        "fluctuation": fluctuation,
+        "stability": stability,
+        "stars": stars,
+        "riskBucket": risk_bucket,
+        "chartRows": chart_rows
+    }
+
+
+def format_fundamentals(ticker):
+    """Company name and formatted fundamentals from the store (no network call)"""
+    try:
+        info = get_fundamentals(ticker)
+        company_name = info.get('longName', ticker.replace('.NS', ''))
+        pe_ratio = info.get('trailingPE', 'N/A')
+        if pe_ratio != 'N/A':
+            pe_ratio = round(pe_ratio, 2)
+
+        dividend_yield = info.get('dividendYield', 0)
+        if dividend_yield:
+            dividend_yield = round(dividend_yield * 100, 2)
+
+        market_cap = info.get('marketCap', 0)
+        if market_cap:
+            market_cap = round(market_cap / 10000000, 2)  # Convert to Cr
+        else:
+            market_cap = "N/A"
+    except:
+        company_name = ticker.replace('.NS', '')
+        pe_ratio = "N/A"
+        dividend_yield = "N/A"
+        market_cap = "N/A"
+
+    return company_name, {
+        "peRatio": pe_ratio,
+        "dividendYield": dividend_yield,
+        "marketCap": market_cap
+    }
+
+
+def build_metrics(ticker, latest_price, growth, cagr, fluctuation, stability, stars,
+                  risk_bucket, chart_dates, chart_prices):
+    """Assemble the metrics response for one ticker from computed values"""
+    company_name, fundamentals = format_fundamentals(ticker)
+    growth = float(growth)
+    return {
+        "ticker": ticker,
+        "companyName": company_name,
+        "latestPrice": round(float(latest_price), 2),
+        "returns": {
+            "absolute": round(growth, 2),
+            "projection": round(10000 * (1 + growth / 100), 2),
+            "cagr": round(float(cagr), 2)
+        },
+        "risk": {
+            "fluctuation": round(float(fluctuation), 2),
+            "level": str(RISK_LEVELS[risk_bucket]),
+            "meter": str(RISK_METERS[risk_bucket])
+        },
+        "stability": {
+            "score": round(float(stability), 2),
+            "stars": int(stars)
+        },
+        "fundamentals": fundamentals,
+        "chartData": {
+            "dates": chart_dates,
+            "prices": chart_prices
+        },
+        "success": True
+    }
+
+
+def get_stock_metrics_batch(prices, dates, tickers, years=5):
+    """
+    Calculate key stock metrics for many tickers from an aligned price matrix
+
+    Args:
+        prices: 2D array of close prices (dates x tickers), NaN for missing bars
+        dates: DatetimeIndex (or datetime64 array) for the rows of prices
+        tickers: Ticker symbol for each column
+        years: Horizon for growth and CAGR
+
+    Returns a dictionary of ticker -> metrics (same shape as get_stock_metrics)
+    """
+    batch = compute_metrics_batch(prices, years)
+    date_strings = np.datetime_as_string(np.asarray(dates, dtype="datetime64[D]"), unit="D")
+    prices = np.asarray(prices, dtype=np.float64)
+
+    results = {}
+    for i, ticker in enumerate(tickers):
+        if batch["count"][i] < 2:
+            results[ticker] = {"error": f"Insufficient data for {ticker}", "success": False}
+            continue
+
+        rows = batch["chartRows"][:, i]
+        rows = rows[rows >= 0]
+        results[ticker] = build_metrics(
+            ticker,
+            latest_price=batch["latestPrice"][i],
+            growth=batch["growth"][i],
+            cagr=batch["cagr"][i],
+            fluctuation=batch["fluctuation"][i],
+            stability=batch["stability"][i],
+            stars=batch["stars"][i],
+            risk_bucket=batch["riskBucket"][i],
+            chart_dates=date_strings[rows].tolist(),
+            chart_prices=prices[rows, i].tolist()
+        )
+    return results
+
 
 def get_stock_metrics(hist, ticker, years=5):
     """
     Calculate key stock metrics from historical data
-    
+
     Returns a dictionary with growth, risk, and stability metrics
     """
     try:
-        # Get basic info
-        latest_price = hist['Close'].iloc[-1]
-        years_ago_index = max(0, int(len(hist) - 252*years))
-        years_ago_price = hist['Close'].iloc[years_ago_index]
-        
-        # Calculate Growth metrics
-        growth_in_years = ((latest_price / years_ago_price) - 1) * 100
-        cagr = (((latest_price / years_ago_price) ** (1/years)) - 1) * 100
-        
-        # Calculate Risk metrics
-        daily_returns = hist['Close'].pct_change().dropna()
-        fluctuation = np.std(daily_returns) * np.sqrt(252) * 100  # Annualized volatility
-        
-        # Calculate Stability Score (modified Sharpe ratio)
-        risk_free_rate = 6  # Current risk-free rate in India (approx.)
-        avg_annual_return = daily_returns.mean() * 252 * 100
-        stability_score = (avg_annual_return - risk_free_rate) / (np.std(daily_returns) * np.sqrt(252))
-        
-        # Get company info
-        stock = yf.Ticker(ticker)
-        try:
-            info = stock.info
-            company_name = info.get('longName', ticker.replace('.NS', ''))
-            pe_ratio = info.get('trailingPE', 'N/A')
-            if pe_ratio != 'N/A':
-                pe_ratio = round(pe_ratio, 2)
-            
-            dividend_yield = info.get('dividendYield', 0)
-            if dividend_yield:
-                dividend_yield = round(dividend_yield * 100, 2)
-            
-            market_cap = info.get('marketCap', 0)
-            if market_cap:
-                market_cap = round(market_cap / 10000000, 2)  # Convert to Cr
-            else:
-                market_cap = "N/A"
-        except:
-            company_name = ticker.replace('.NS', '')
-            pe_ratio = "N/A"
-            dividend_yield = "N/A"
-            market_cap = "N/A"
-        
-        # Determine Reliability Stars
-        if stability_score > 1.5 and fluctuation < 15:
-            reliability_stars = 5
-        elif 1.0 <= stability_score <= 1.5:
-            reliability_stars = 4
-        elif 0.5 <= stability_score <= 1.0:
-            reliability_stars = 3
-        elif 0 <= stability_score <= 0.5:
-            reliability_stars = 2
-        else:
-            reliability_stars = 1
-        
-        # Determine Risk Level
-        if fluctuation < 15:
-            risk_level = "Low"
-            risk_meter = "Safe"
-        elif 15 <= fluctuation <= 30:
-            risk_level = "Medium"
-            risk_meter = "Moderate Risk"
-        else:
-            risk_level = "High"
-            risk_meter = "High Risk"
-            
-        # Get chart data (last 30 days)
-        recent_data = hist[-30:]['Close'].tolist()
-        dates = [d.strftime('%Y-%m-%d') for d in hist[-30:].index.tolist()]
-        
-        return {
-            "ticker": ticker,
-            "companyName": company_name,
-            "latestPrice": round(latest_price, 2),
-            "returns": {
-                "absolute": round(growth_in_years, 2),
-                "projection": round(10000 * (1 + growth_in_years / 100), 2),
-                "cagr": round(cagr, 2)
-            },
-            "risk": {
-                "fluctuation": round(fluctuation, 2),
-                "level": risk_level,
-                "meter": risk_meter
-            },
-            "stability": {
-                "score": round(stability_score, 2),
-                "stars": reliability_stars
-            },
-            "fundamentals": {
-                "peRatio": pe_ratio,
-                "dividendYield": dividend_yield,
-                "marketCap": market_cap
-            },
-            "chartData": {
-                "dates": dates,
-                "prices": recent_data
-            },
-            "success": True
-        }
+        prices = hist['Close'].to_numpy(dtype=np.float64).reshape(-1, 1)
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        return get_stock_metrics_batch(prices, index.values, [ticker], years)[ticker]
     except Exception as e:
-        return {"error": str(e), "success": False}
\ No newline at end of file
+        return {"error": str(e), "success": False}